@@ -1,7 +1,8 @@
 """Application configuration management."""
 
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from typing import Any, Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -26,13 +27,25 @@ class Settings(BaseSettings):
     environment: str = "development"
     log_level: str = "INFO"
     port: int = 8080
+    # Uvicorn worker processes for `python -m src.main --mode webhook`
+    # in production. Keep 1: conversation state (custom-date prompts),
+    # album buffering, per-chat ordering and read caches live in the
+    # process, and Telegram spreads webhook calls across workers. More
+    # than 1 needs that state moved to an external store first.
+    workers: int = 1
+    # Threads for blocking Sheets/GCS calls made via asyncio.to_thread
+    io_thread_pool_size: int = 64
 
     # OCR Configuration
     # Reject extractions below 50% confidence
     min_confidence_threshold: float = 0.5
+    # Concurrent Gemini requests per process (keeps bursts under quota)
+    gemini_max_concurrency: int = 4
 
     # Webhook (for production)
     webhook_url: Optional[str] = None
+    # Updates accepted but not yet processed before /webhook answers 429
+    max_inflight_updates: int = 64
 
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -56,5 +69,14 @@ class Settings(BaseSettings):
         return self.credentials_path.exists()
 
 
-# Global settings instance
-settings = Settings()
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Get the global settings instance, parsing the environment on first use."""
+    return Settings()
+
+
+def __getattr__(name: str) -> Any:
+    """Resolve the legacy module-level ``settings`` name lazily."""
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,28 +1,86 @@
 """Google Gemini Vision API client for delivery receipt processing."""
 
-import json
+import asyncio
+import math
 import os
+import threading
+from functools import lru_cache
 from typing import Optional, Tuple, Dict
-from io import BytesIO
-import vertexai
-from vertexai.generative_models import GenerativeModel, Part, GenerationConfig
+import orjson
 from PIL import Image
 from loguru import logger
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import AsyncRetrying, stop_after_attempt, wait_exponential
 
 from ..models.delivery import DeliveryReceiptData
 from ..config import settings
+from ..utils.image import preprocess_image
 from .prompts import (
     SYSTEM_PROMPT,
-    RECEIPT_EXTRACTION_PROMPT
+    RECEIPT_EXTRACTION_PROMPT,
+    RECEIPT_EXTRACTION_SCHEMA
 )
 
+# Receipts don't need full resolution - 800x800 is sufficient
+MAX_IMAGE_SIZE = (800, 800)
+
+# The extraction JSON is ~200 tokens; cap generation to cut off runaway output
+MAX_OUTPUT_TOKENS = 512
+
+# Images larger than this are passed to Gemini by their GCS receipt URI
+# rather than inline (see TelegramHandler._process_single_image)
+INLINE_IMAGE_LIMIT = 256 * 1024
+
+# Confidence penalties for suspiciously short fields:
+# (attribute, minimum length, penalty multiplier)
+_CONFIDENCE_RULES = (
+    ("receipt_number", 5, 0.8),
+    ("material_name", 3, 0.7),
+    # Vehicle number should have letters and numbers
+    ("vehicle_number", 4, 0.8),
+)
+
+
+@lru_cache(maxsize=None)
+def _get_model(model_name: str, system_prompt: str):
+    """Get a shared GenerativeModel for a model name and system prompt."""
+    from vertexai.generative_models import GenerativeModel
+
+    return GenerativeModel(model_name, system_instruction=[system_prompt])
+
+
+@lru_cache(maxsize=1)
+def _get_generation_config():
+    """Get the shared generation config for JSON extraction responses.
+
+    The response schema is enforced server-side, so material_type can only
+    be one of MATERIAL_TYPES.
+    """
+    from vertexai.generative_models import GenerationConfig
+
+    return GenerationConfig(
+        response_mime_type="application/json",
+        response_schema=RECEIPT_EXTRACTION_SCHEMA,
+        max_output_tokens=MAX_OUTPUT_TOKENS
+    )
+
+
+@lru_cache(maxsize=1)
+def _get_part_class():
+    """Get the Vertex AI Part class used to attach receipt images."""
+    from vertexai.generative_models import Part
+
+    return Part
+
 
 class GeminiClient:
     """Client for Google Gemini Vision API."""
 
     def __init__(self):
         """Initialize Gemini client with Vertex AI."""
+        # Import the Vertex AI SDK on first construction rather than when
+        # the package is imported
+        import vertexai
+
         try:
             # Set GOOGLE_APPLICATION_CREDENTIALS only for local development
             # In Cloud Run, use the attached service account instead
@@ -43,53 +101,51 @@ class GeminiClient:
             # Create generative model
             # Use Gemini 2.5 Flash-Lite for Vertex AI
             self.model_name = "gemini-2.5-flash-lite"
-            self.model = GenerativeModel(
-                self.model_name,
-                system_instruction=[SYSTEM_PROMPT]
+            self.model = _get_model(self.model_name, SYSTEM_PROMPT)
+
+            # Caps in-flight Gemini requests; extra receipts wait their turn
+            # instead of tripping the Vertex AI quota
+            self._semaphore = asyncio.Semaphore(
+                settings.gemini_max_concurrency
             )
             logger.info(
                 f"Vertex AI initialized (project: {settings.gcp_project_id}, "
                 f"location: {settings.gcp_location}, model: {self.model_name})"
             )
+
+            # Resolve credentials, DNS and TLS in the background so the
+            # first receipt doesn't pay for it
+            threading.Thread(
+                target=self._warm_up, name="gemini-warmup", daemon=True
+            ).start()
         except Exception as e:
             logger.error(f"Failed to initialize Vertex AI Gemini client: {e}")
             raise
 
-    def preprocess_image(self, image_bytes: bytes) -> Image.Image:
-        """Preprocess image for better OCR results."""
+    def _warm_up(self):
+        """Send a tiny count_tokens request to open the Vertex AI connection."""
         try:
-            img = Image.open(BytesIO(image_bytes))
-
-            # Auto-rotate based on EXIF orientation
-            try:
-                from PIL import ImageOps
-                img = ImageOps.exif_transpose(img)
-            except Exception:
-                pass
-
-            # Convert to RGB if needed
-            if img.mode != "RGB":
-                img = img.convert("RGB")
-
-            # Resize if too large (optimize for speed and cost)
-            # Receipts don't need full resolution - 800x800 is sufficient
-            max_size = (800, 800)
-            if (img.size[0] > max_size[0] or
-                    img.size[1] > max_size[1]):
-                img.thumbnail(max_size, Image.Resampling.LANCZOS)
-                logger.info(f"Resized image to {img.size}")
+            self.model.count_tokens("warmup")
+            logger.info("Vertex AI connection warmed up")
+        except Exception as e:
+            logger.warning(f"Vertex AI warm-up failed (non-critical): {e}")
 
-            return img
+    def maybe_preprocess(self, image_bytes: bytes) -> bytes:
+        """Preprocess image for better OCR results.
 
+        Returns image_bytes unchanged when they are already an upright JPEG
+        within MAX_IMAGE_SIZE, otherwise a freshly encoded JPEG.
+        """
+        try:
+            return preprocess_image(
+                image_bytes, MAX_IMAGE_SIZE, quality=85,
+                resample=Image.Resampling.LANCZOS
+            )
         except Exception as e:
             logger.error(f"Failed to preprocess image: {e}")
             raise
 
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=2, max=10)
-    )
-    def extract_receipt_data(
+    async def extract_receipt_data_async(
         self,
         image_bytes: bytes = None,
         gcs_uri: str = None
@@ -103,9 +159,28 @@ class GeminiClient:
 
         Returns:
             Tuple of (DeliveryReceiptData or None, confidence_score, token_usage_dict)
+
+        The Gemini call is retried with exponential backoff; waits between
+        attempts yield to the event loop instead of blocking a thread.
         """
+        Part = _get_part_class()
+
         try:
-            # Use GCS URI if provided (more efficient)
+            img_bytes = None
+            if not gcs_uri:
+                # Fall back to inline image data
+                if not image_bytes:
+                    raise ValueError(
+                        "Either image_bytes or gcs_uri must be provided"
+                    )
+
+                # Preprocess image (unchanged if already small enough)
+                # Pillow work is CPU-bound, keep it off the event loop
+                img_bytes = await asyncio.to_thread(
+                    self.maybe_preprocess, image_bytes
+                )
+
+            # Use GCS URI if available (more efficient)
             if gcs_uri:
                 logger.info(
                     f"Using GCS URI for Vertex AI: {gcs_uri}"
@@ -115,38 +190,24 @@ class GeminiClient:
                     mime_type="image/jpeg"
                 )
             else:
-                # Fall back to inline image data
-                if not image_bytes:
-                    raise ValueError(
-                        "Either image_bytes or gcs_uri must be provided"
-                    )
-
-                # Preprocess image
-                img = self.preprocess_image(image_bytes)
-
-                # Convert to bytes (JPEG smaller, faster)
-                img_byte_arr = BytesIO()
-                img.save(
-                    img_byte_arr, format="JPEG", quality=85, optimize=True
-                )
-                img_bytes = img_byte_arr.getvalue()
-
                 # Create image part (Vertex AI inline data)
                 image_part = Part.from_data(
                     mime_type="image/jpeg",
                     data=img_bytes
                 )
 
-            # Configure generation with JSON response
-            generation_config = GenerationConfig(
-                response_mime_type="application/json",
-            )
-
             # Call Gemini Vision API with structured output
-            response = self.model.generate_content(
-                contents=[RECEIPT_EXTRACTION_PROMPT, image_part],
-                generation_config=generation_config
-            )
+            async for attempt in AsyncRetrying(
+                stop=stop_after_attempt(3),
+                wait=wait_exponential(multiplier=1, min=2, max=10),
+                reraise=True
+            ):
+                with attempt:
+                    async with self._semaphore:
+                        response = await self.model.generate_content_async(
+                            contents=[RECEIPT_EXTRACTION_PROMPT, image_part],
+                            generation_config=_get_generation_config()
+                        )
 
             # Extract token usage metadata
             token_usage = None
@@ -169,7 +230,7 @@ class GeminiClient:
             logger.info(f"Gemini response: {response_text}")
 
             # Parse JSON
-            data = json.loads(response_text)
+            data = orjson.loads(response_text)
 
             # Create DeliveryReceiptData object with validation
             receipt_data = DeliveryReceiptData(**data)
@@ -188,7 +249,7 @@ class GeminiClient:
 
             return receipt_data, confidence, token_usage
 
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             logger.error(f"Failed to parse JSON from Gemini response: {e}")
             logger.error(f"Response text: {response_text}")
             return None, 0.0, None
@@ -228,16 +289,11 @@ class GeminiClient:
                 f"= {calculated_net} vs {receipt.net_weight}"
             )
 
-        # Check receipt number quality
-        if len(receipt.receipt_number) < 5:
-            confidence *= 0.8
-
-        # Check material name quality
-        if len(receipt.material_name) < 3:
-            confidence *= 0.7
-
-        # Check vehicle number format (should have letters and numbers)
-        if len(receipt.vehicle_number) < 4:
-            confidence *= 0.8
+        # Check receipt number, material name and vehicle number quality
+        confidence *= math.prod(
+            penalty
+            for attr, min_length, penalty in _CONFIDENCE_RULES
+            if len(getattr(receipt, attr)) < min_length
+        )
 
         return confidence
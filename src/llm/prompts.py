@@ -1,5 +1,7 @@
 """Prompts for Gemini Vision API - Boulder Delivery Receipt Extraction."""
 
+from ..models.delivery import MATERIAL_TYPES
+
 SYSTEM_PROMPT = """You are an AI-Powered Delivery Receipt OCR bot \
 specializing in extracting data from Indonesian weighing receipts \
 (BUKTI PENIMBANGAN). Your primary goal is to extract structured, \
@@ -29,30 +31,12 @@ Focus on accurately identifying and extracting the following fields:
 7. BERAT KOSONG: Empty weight in tons (vehicle weight without material)
 8. BERAT BERSIH: Net weight in tons (actual material weight)
 
-Required fields:
-- receipt_number: NO NOTA value (string)
-- scale_number: NOMOR TIMBANGAN value (string)
-- weighing_datetime: WAKTU PENIMBANGAN in YYYY-MM-DD HH:MM:SS format (string)
-- vehicle_number: NOMOR UNIT value (string)
-- material_name: NAMA MATERIAL value, include both Indonesian and Chinese \
-text if present (string)
-- gross_weight: BERAT ISI value in tons (number)
-- empty_weight: BERAT KOSONG value in tons (number)
-- net_weight: BERAT BERSIH value in tons (number)
-- confidence_score: Your confidence in extraction accuracy 0.0-1.0 (number)
-- material_type: Categorize the material into one of these categories: \
-"Batu Pecah 1/2", "Batu Pecah 2/3", "Batu Pecah 3/5", "Batu Sungai", \
-"Boulder", "Kerikil", "Pasir", "Abu Batu", "Lainnya". Look for size patterns \
-like 1/2, 2/3, 3/5 in the material name. (string)
-
-Important constraints:
-- Convert datetime to YYYY-MM-DD HH:MM:SS format (24-hour format)
-- All weight values must be numerical (float), representing tons
-- Net weight should approximately equal gross_weight - empty_weight
-- Preserve material name exactly as shown, including special characters
-- Categorize material_type based on the extracted material_name
-- If you cannot clearly read a value, make your best guess but note lower \
-confidence score"""
+Guidance:
+- Preserve the material name exactly as shown, including Chinese text
+- Pick material_type based on the material name; look for size patterns \
+like 1/2, 2/3, 3/5
+- If you cannot clearly read a value, make your best guess but lower the \
+confidence_score"""
 
 RECEIPT_EXTRACTION_SCHEMA = {
     "type": "object",
@@ -67,7 +51,9 @@ RECEIPT_EXTRACTION_SCHEMA = {
         },
         "weighing_datetime": {
             "type": "string",
-            "description": "WAKTU PENIMBANGAN in YYYY-MM-DD HH:MM:SS format"
+            "description": (
+                "WAKTU PENIMBANGAN in YYYY-MM-DD HH:MM:SS format (24-hour)"
+            )
         },
         "vehicle_number": {
             "type": "string",
@@ -75,7 +61,10 @@ RECEIPT_EXTRACTION_SCHEMA = {
         },
         "material_name": {
             "type": "string",
-            "description": "NAMA MATERIAL - Material/boulder type name"
+            "description": (
+                "NAMA MATERIAL - Material/boulder type name, including both "
+                "Indonesian and Chinese text if present"
+            )
         },
         "gross_weight": {
             "type": "number",
@@ -87,7 +76,10 @@ RECEIPT_EXTRACTION_SCHEMA = {
         },
         "net_weight": {
             "type": "number",
-            "description": "BERAT BERSIH - Net material weight in tons"
+            "description": (
+                "BERAT BERSIH - Net material weight in tons, approximately "
+                "gross_weight - empty_weight"
+            )
         },
         "confidence_score": {
             "type": "number",
@@ -95,7 +87,8 @@ RECEIPT_EXTRACTION_SCHEMA = {
         },
         "material_type": {
             "type": "string",
-            "description": "Material category from predefined list"
+            "description": "Material category from predefined list",
+            "enum": MATERIAL_TYPES
         }
     },
     "required": [
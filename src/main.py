@@ -1,14 +1,34 @@
 """Main FastAPI application for expense tracker bot."""
 
 import sys
+import signal
 import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
 from contextlib import asynccontextmanager
+
+import orjson
 from fastapi import FastAPI, Request
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, PlainTextResponse, Response
 from telegram import Update
 from loguru import logger
 
 from .config import settings
-from .messaging.telegram_handler import TelegramHandler
+from .messaging.telegram_handler import (
+    ALLOWED_UPDATES,
+    POLL_TIMEOUT,
+    TelegramHandler
+)
+
+# Settings read once at import instead of on every request
+_ENV = settings.environment
+_IS_PROD = settings.is_production
+_WEBHOOK_URL = settings.webhook_url
+_PORT = settings.port
+_MAX_INFLIGHT_UPDATES = settings.max_inflight_updates
 
 
 # Configure logging
@@ -21,7 +41,8 @@ logger.add(
         "<cyan>{name}</cyan>:<cyan>{function}</cyan> - "
         "<level>{message}</level>"
     ),
-    level=settings.log_level
+    level=settings.log_level,
+    enqueue=True  # Write from a background thread, not the event loop
 )
 
 
@@ -31,6 +52,109 @@ telegram_handler: TelegramHandler = None
 # Track background tasks to prevent them from being garbage collected
 background_tasks: set = set()
 
+# Telegram only looks at the status code of webhook replies, so a single
+# prebuilt plaintext response is reused for every acknowledgement
+_OK_RESPONSE = PlainTextResponse("ok")
+
+# Static bodies encoded once; /health is hit constantly by Cloud Run probes
+_ROOT_RESP = Response(
+    content=orjson.dumps({
+        "service": "Expense Tracker Bot",
+        "status": "running",
+        "version": "1.0.0"
+    }),
+    media_type="application/json"
+)
+_HEALTH_RESP = Response(
+    content=orjson.dumps({
+        "status": "healthy",
+        "environment": _ENV
+    }),
+    media_type="application/json",
+    headers={"cache-control": "no-cache"}
+)
+
+# Sent when max_inflight_updates is reached - Telegram retries later
+_BUSY_RESPONSE = Response(status_code=429)
+
+# Updates accepted by /webhook that have not finished processing
+inflight_updates: int = 0
+
+# Concurrent webhook connections Telegram may open (kept low for stability)
+WEBHOOK_MAX_CONNECTIONS = 5
+
+# How long /webhook_info reuses Telegram's answer
+WEBHOOK_INFO_TTL = 30.0
+
+# Cached (fetched_at, webhook_info dict) for /webhook_info
+_webhook_info_cache: Optional[Tuple[float, Dict[str, Any]]] = None
+
+# Pending updates per chat - one worker drains each queue so updates from
+# the same chat are processed in order while chats run concurrently
+chat_queues: Dict[int, asyncio.Queue] = {}
+
+
+def _track_task(coro) -> asyncio.Task:
+    """Create a background task and keep a reference until it finishes."""
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+
+ProcessUpdate = Callable[[Update], Awaitable[None]]
+
+
+async def _chat_worker(
+    chat_id: int, queue: asyncio.Queue, process_update: ProcessUpdate
+):
+    """Process queued updates for one chat, exiting once the queue drains."""
+    while True:
+        update = await queue.get()
+        try:
+            await process_update(update)
+        except Exception as e:
+            logger.error(
+                f"Error processing update for chat {chat_id}: {e}",
+                exc_info=True
+            )
+        finally:
+            queue.task_done()
+
+        if queue.empty():
+            # No await between the check and removal, so a new update
+            # either lands in this queue first or starts a fresh worker
+            del chat_queues[chat_id]
+            return
+
+
+def dispatch_update(update: Update, process_update: ProcessUpdate) -> None:
+    """Queue an update on its chat's worker (or run it directly)."""
+    chat = update.effective_chat
+    if chat is None:
+        _track_task(process_update(update))
+        return
+
+    queue = chat_queues.get(chat.id)
+    if queue is None:
+        queue = chat_queues[chat.id] = asyncio.Queue()
+        _track_task(_chat_worker(chat.id, queue, process_update))
+    queue.put_nowait(update)
+
+
+def _install_io_executor() -> None:
+    """Replace the default executor used by asyncio.to_thread.
+
+    The stock pool (min(32, CPUs + 4) threads) is sized for CPU work; the
+    handler's Sheets/GCS calls mostly wait on the network.
+    """
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(
+            max_workers=settings.io_thread_pool_size,
+            thread_name_prefix="io"
+        )
+    )
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -39,36 +163,54 @@ async def lifespan(app: FastAPI):
 
     # Startup
     logger.info("🚀 Starting Expense Tracker Bot")
-    logger.info(f"Environment: {settings.environment}")
+    logger.info(f"Environment: {_ENV}")
     logger.info(f"Log Level: {settings.log_level}")
 
+    _install_io_executor()
+
     # Initialize Telegram handler
     telegram_handler = TelegramHandler()
 
     # Create application
     telegram_app = telegram_handler.create_application()
 
+    # Start building the Google clients in the background (not awaited)
+    await telegram_handler.initialize()
+
     # Initialize bot
     await telegram_app.initialize()
     await telegram_app.bot.initialize()
 
-    # Set webhook if in production
-    if settings.is_production and settings.webhook_url:
-        webhook_url = f"{settings.webhook_url}/webhook"
-        logger.info(f"Setting webhook to: {webhook_url}")
+    # Precompute settings-derived values used by the endpoints
+    app.state.webhook_url_full = (
+        f"{_WEBHOOK_URL}/webhook" if _WEBHOOK_URL else None
+    )
+
+    # Set webhook if in production (skipped when already configured,
+    # which saves a Telegram round-trip on most cold starts)
+    if _IS_PROD and _WEBHOOK_URL:
+        webhook_url = app.state.webhook_url_full
 
         try:
-            await telegram_app.bot.set_webhook(
-                url=webhook_url,
-                allowed_updates=[
-                    "message", "edited_message", "callback_query"
-                ],
-                max_connections=5,  # Limit connections for stability
-                drop_pending_updates=False  # Keep pending updates
-            )
-
             webhook_info = await telegram_app.bot.get_webhook_info()
-            logger.info(f"Webhook info: {webhook_info}")
+            if (
+                webhook_info.url == webhook_url
+                and set(webhook_info.allowed_updates or ())
+                == set(ALLOWED_UPDATES)
+                and webhook_info.max_connections == WEBHOOK_MAX_CONNECTIONS
+            ):
+                logger.info(f"Webhook already configured: {webhook_url}")
+            else:
+                logger.info(f"Setting webhook to: {webhook_url}")
+                await telegram_app.bot.set_webhook(
+                    url=webhook_url,
+                    allowed_updates=ALLOWED_UPDATES,
+                    max_connections=WEBHOOK_MAX_CONNECTIONS,
+                    drop_pending_updates=False  # Keep pending updates
+                )
+
+                webhook_info = await telegram_app.bot.get_webhook_info()
+                logger.info(f"Webhook info: {webhook_info}")
         except Exception as e:
             logger.error(f"Failed to set webhook: {e}")
             logger.warning(
@@ -79,6 +221,23 @@ async def lifespan(app: FastAPI):
 
     # Store app in state
     app.state.telegram_app = telegram_app
+    # Bound once so the webhook hot path is a single call each
+    app.state.de_json = partial(Update.de_json, bot=telegram_app.bot)
+    app.state.update_semaphore = update_semaphore = asyncio.Semaphore(
+        _MAX_INFLIGHT_UPDATES
+    )
+
+    async def process_update(update: Update) -> None:
+        """Process one update, then free its in-flight slot."""
+        global inflight_updates
+        try:
+            await telegram_app.process_update(update)
+        finally:
+            inflight_updates -= 1
+            update_semaphore.release()
+
+    app.state.process_update = process_update
+    app.state.get_webhook_info = telegram_app.bot.get_webhook_info
     app.state.telegram_handler = telegram_handler
 
     logger.info("✅ Bot initialized successfully")
@@ -107,6 +266,12 @@ async def lifespan(app: FastAPI):
                 "Background tasks did not complete in time, forcing shutdown"
             )
 
+    # Flush the handler's buffered albums and saves, then wait for them
+    try:
+        await asyncio.wait_for(telegram_handler.shutdown(), timeout=60.0)
+    except asyncio.TimeoutError:
+        logger.warning("Handler background work did not finish in time")
+
     await telegram_app.shutdown()
     logger.info("Bot shut down complete")
 
@@ -116,80 +281,158 @@ app = FastAPI(
     title="Expense Tracker Bot",
     description="Automated expense tracking with AI",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 
-@app.get("/")
+@app.exception_handler(orjson.JSONDecodeError)
+async def json_decode_error_handler(request: Request, exc: orjson.JSONDecodeError):
+    """Reject malformed request bodies without a traceback."""
+    logger.warning(f"Malformed JSON body on {request.url.path}: {exc}")
+    if request.url.path == "/webhook":
+        # Return 200 anyway to prevent Telegram from retrying
+        return ORJSONResponse({"ok": False})
+    return ORJSONResponse({"ok": False}, status_code=400)
+
+
+class UnhandledErrorMiddleware:
+    """Log unexpected errors once and answer with a JSON body.
+
+    An Exception handler would run inside Starlette's ServerErrorMiddleware,
+    which re-raises after responding, so uvicorn logged every traceback a
+    second time; this middleware handles the error without re-raising.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        response_started = False
+
+        async def send_wrapper(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as exc:
+            if response_started:
+                # Too late for an error response, let the server close it
+                raise
+            path = scope["path"]
+            logger.error(f"Error handling {path}: {exc}", exc_info=exc)
+            if path == "/webhook":
+                # Return 200 anyway to prevent Telegram from retrying
+                response = ORJSONResponse({"ok": False})
+            else:
+                response = ORJSONResponse({"ok": False}, status_code=500)
+            await response(scope, receive, send)
+
+
+app.add_middleware(UnhandledErrorMiddleware)
+
+# Compress larger diagnostic responses (e.g. /webhook_info); the tiny
+# /webhook and /health replies stay below the threshold
+app.add_middleware(GZipMiddleware, minimum_size=512)
+
+
+@app.get("/", response_model=None)
 async def root():
     """Root endpoint."""
-    return {
-        "service": "Expense Tracker Bot",
-        "status": "running",
-        "version": "1.0.0"
-    }
+    return _ROOT_RESP
 
 
-@app.get("/health")
+@app.get("/health", response_model=None)
 async def health_check():
     """Health check endpoint for Cloud Run."""
-    return {
-        "status": "healthy",
-        "environment": settings.environment
-    }
+    return _HEALTH_RESP
 
 
-@app.post("/webhook")
-async def telegram_webhook(request: Request):
+async def telegram_webhook(request: Request) -> Response:
     """
     Webhook endpoint for Telegram updates.
 
     Telegram POSTs updates here when users send messages.
-    Returns 200 immediately and processes in background.
+    Returns 200 immediately and processes in background, in order
+    per chat. Answers 429 while max_inflight_updates are pending.
     """
-    try:
-        # Get update data
-        data = await request.json()
-        logger.debug(f"Received webhook update: {data}")
+    global inflight_updates
 
-        # Convert to Telegram Update object
-        telegram_app = request.app.state.telegram_app
-        update = Update.de_json(data, telegram_app.bot)
+    # Get update data
+    data = orjson.loads(await request.body())
+    logger.opt(lazy=True).debug("Received webhook update: {}", lambda: data)
+
+    state = request.app.state
+    if state.update_semaphore.locked():
+        return _BUSY_RESPONSE
 
-        # Create background task and track it
-        task = asyncio.create_task(telegram_app.process_update(update))
+    # Convert to Telegram Update object
+    update = state.de_json(data)
+    if update is None:
+        # Empty body (e.g. {} or null) - nothing to process
+        return _OK_RESPONSE
 
-        # Track the task to prevent garbage collection
-        background_tasks.add(task)
+    # No await since the check above, so a slot is free and this
+    # returns immediately
+    await state.update_semaphore.acquire()
+    inflight_updates += 1
 
-        # Remove task from set when done (cleanup)
-        task.add_done_callback(lambda t: background_tasks.discard(t))
+    # Hand off to the chat's worker (tracked as a background task)
+    try:
+        dispatch_update(update, state.process_update)
+    except Exception:
+        # process_update never ran, so free the slot here
+        inflight_updates -= 1
+        state.update_semaphore.release()
+        raise
 
-        # Return 200 immediately
-        return {"ok": True}
+    # Return 200 immediately
+    return _OK_RESPONSE
 
-    except Exception as e:
-        logger.error(f"Error processing webhook: {e}", exc_info=True)
-        # Return 200 anyway to prevent Telegram from retrying
-        return {"ok": True}
 
+# Plain Starlette route - skips FastAPI's dependency/response-model
+# wrapper since the handler only needs the raw request
+app.add_route("/webhook", telegram_webhook, methods=["POST"])
 
-@app.get("/set_webhook")
+
+@app.get("/metrics", response_model=None)
+async def metrics(request: Request):
+    """Report webhook backpressure state."""
+    return {
+        "inflight_updates": inflight_updates,
+        "max_inflight_updates": _MAX_INFLIGHT_UPDATES,
+        "active_chats": len(chat_queues),
+        "background_tasks": len(background_tasks)
+    }
+
+
+@app.get("/set_webhook", response_model=None)
 async def set_webhook_endpoint(request: Request):
     """Manually set webhook (for testing/debugging)."""
-    if not settings.webhook_url:
+    global _webhook_info_cache
+
+    webhook_url = request.app.state.webhook_url_full
+    if not webhook_url:
         return {"error": "WEBHOOK_URL not configured"}
 
     try:
         telegram_app = request.app.state.telegram_app
-        webhook_url = f"{settings.webhook_url}/webhook"
 
         await telegram_app.bot.set_webhook(
             url=webhook_url,
-            allowed_updates=["message", "edited_message"]
+            allowed_updates=ALLOWED_UPDATES,
+            max_connections=WEBHOOK_MAX_CONNECTIONS
         )
 
         webhook_info = await telegram_app.bot.get_webhook_info()
+        _webhook_info_cache = (time.monotonic(), webhook_info.to_dict())
 
         return {
             "success": True,
@@ -202,15 +445,21 @@ async def set_webhook_endpoint(request: Request):
         return {"error": str(e)}
 
 
-@app.get("/webhook_info")
+@app.get("/webhook_info", response_model=None)
 async def get_webhook_info(request: Request):
-    """Get current webhook information."""
+    """Get current webhook information (cached for WEBHOOK_INFO_TTL)."""
+    global _webhook_info_cache
+
+    now = time.monotonic()
+    if _webhook_info_cache and now - _webhook_info_cache[0] < WEBHOOK_INFO_TTL:
+        return {"webhook_info": _webhook_info_cache[1]}
+
     try:
-        telegram_app = request.app.state.telegram_app
-        webhook_info = await telegram_app.bot.get_webhook_info()
+        webhook_info = await request.app.state.get_webhook_info()
+        _webhook_info_cache = (now, webhook_info.to_dict())
 
         return {
-            "webhook_info": webhook_info.to_dict()
+            "webhook_info": _webhook_info_cache[1]
         }
 
     except Exception as e:
@@ -225,25 +474,34 @@ async def run_polling():
 
     logger.info("🔄 Starting bot in polling mode (development)")
 
+    _install_io_executor()
+
     telegram_handler = TelegramHandler()
     application = telegram_handler.create_application()
 
     # Initialize and start polling
+    await telegram_handler.initialize()
     await application.initialize()
     await application.start()
-    await application.updater.start_polling(allowed_updates=Update.ALL_TYPES)
+    await application.updater.start_polling(
+        allowed_updates=ALLOWED_UPDATES, timeout=POLL_TIMEOUT
+    )
 
     logger.info("✅ Bot is running in polling mode. Press Ctrl+C to stop.")
 
-    # Keep running
-    import asyncio
-    try:
-        await asyncio.Event().wait()
-    except KeyboardInterrupt:
-        logger.info("Stopping bot...")
-        await application.updater.stop()
-        await application.stop()
-        await application.shutdown()
+    # Keep running until Ctrl+C or SIGTERM (docker stop)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await stop.wait()
+
+    logger.info("Stopping bot...")
+    await application.updater.stop()
+    await application.stop()
+    await telegram_handler.shutdown()
+    await application.shutdown()
 
 
 if __name__ == "__main__":
@@ -260,14 +518,28 @@ if __name__ == "__main__":
 
     if args.mode == "polling":
         # Run with polling for local development
+        # (same uvloop event loop as the webhook server)
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
         asyncio.run(run_polling())
     else:
         # Run with uvicorn for webhook mode
         import uvicorn
+
         uvicorn.run(
             "src.main:app",
             host="0.0.0.0",
-            port=settings.port,
+            port=_PORT,
+            loop="uvloop",
+            http="httptools",
+            access_log=False,  # Handlers log via loguru
+            server_header=False,
+            date_header=False,
             log_level=settings.log_level.lower(),
-            reload=not settings.is_production
+            # Production runs settings.workers processes (1 by default,
+            # see config); development reloads on code changes instead
+            **(
+                {"workers": settings.workers} if _IS_PROD
+                else {"reload": True}
+            )
         )
@@ -1,5 +1,5 @@
 """Messaging handlers for Telegram bot."""
 
-from .telegram_handler import TelegramHandler
+from .telegram_handler import ALLOWED_UPDATES, TelegramHandler
 
-__all__ = ["TelegramHandler"]
+__all__ = ["ALLOWED_UPDATES", "TelegramHandler"]
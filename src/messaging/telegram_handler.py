@@ -1,39 +1,67 @@
 """Telegram bot handler for delivery receipt tracking."""
 
 import asyncio
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+import re
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from functools import lru_cache, partial
+from html import escape
+from io import BytesIO
+from typing import Callable, Optional
+from telegram import (
+    Update,
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    Message
+)
+from telegram.error import TelegramError
 from telegram.ext import (
     Application,
+    BaseUpdateProcessor,
     CommandHandler,
     MessageHandler,
     CallbackQueryHandler,
     filters,
     ContextTypes
 )
+from telegram.request import HTTPXRequest
+from cachetools import TTLCache
 from loguru import logger
-import tempfile
-import os
 
 from ..config import settings
-from ..llm.gemini_client import GeminiClient
+from ..llm.gemini_client import INLINE_IMAGE_LIMIT, GeminiClient
 from ..storage.sheets_client import SheetsClient
 from ..models.delivery import DeliveryRecord, TokenUsageRecord
 
+# Update types the bot handles (commands/photos/text and inline buttons).
+# Shared by webhook registration and polling so the two never drift.
+ALLOWED_UPDATES = ("message", "edited_message", "callback_query")
 
-class TelegramHandler:
-    """Handler for Telegram bot interactions - Delivery Receipt Tracking."""
+# Seconds Telegram holds a getUpdates request open when polling (Telegram's
+# maximum is 50); longer polls mean fewer idle round-trips
+POLL_TIMEOUT = 50
 
-    def __init__(self):
-        """Initialize Telegram handler."""
-        self.bot_token = settings.telegram_bot_token
-        self.gemini_client = GeminiClient()
-        self.sheets_client = SheetsClient()
+# Album photos arrive as separate updates; the album is processed once
+# no new photo has arrived for this many seconds
+MEDIA_GROUP_DELAY = 1.5
 
-        logger.info("Telegram handler initialized for delivery tracking")
+# Threads reserved for image uploads to GCS (also caps concurrent uploads)
+UPLOAD_MAX_WORKERS = 8
 
-    async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Handle /start command."""
-        welcome_message = """
+# Concurrent Sheets API calls per process - stays under the per-user
+# request quota so bursts queue here instead of in 429 backoff
+SHEETS_MAX_CONCURRENCY = 10
+
+# Single-receipt saves arriving within SAVE_BATCH_DELAY seconds of each
+# other share one Sheets append (flushed early once SAVE_BATCH_SIZE queue)
+SAVE_BATCH_SIZE = 25
+SAVE_BATCH_DELAY = 0.5
+
+# /start welcome text
+_START_MESSAGE = """
 👋 Selamat datang di Bot Tracking Pengiriman Batu!
 
 Saya dapat membantu Anda melacak pengiriman material secara otomatis menggunakan AI.
@@ -50,37 +78,10 @@ Fitur yang tersedia:
 📊 Lihat Pengiriman Terbaru
 📈 Total Berat Bersih
 ℹ️ Bantuan & Info
-        """
+""".strip()
 
-        # Add quick access menu buttons
-        keyboard = [
-            [
-                InlineKeyboardButton("🚀 Mulai Sekarang", callback_data="menu_upload"),
-                InlineKeyboardButton("📋 Lihat Menu", callback_data="show_menu")
-            ]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-
-        await update.message.reply_text(
-            welcome_message.strip(),
-            reply_markup=reply_markup
-        )
-
-    async def menu_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Handle /menu command - show main menu with quick action buttons."""
-        keyboard = [
-            [
-                InlineKeyboardButton("📸 Upload Bukti", callback_data="menu_upload"),
-                InlineKeyboardButton("📊 Cek Pengiriman", callback_data="menu_check")
-            ],
-            [
-                InlineKeyboardButton("📈 Total Hari Ini", callback_data="menu_total"),
-                InlineKeyboardButton("ℹ️ Bantuan", callback_data="menu_help")
-            ]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-
-        menu_message = """
+# Main menu text (/menu and the "Lihat Menu" button)
+_MENU_MESSAGE = """
 🏠 *Menu Utama - Bot Tracking Pengiriman*
 
 Pilih salah satu opsi di bawah ini atau gunakan perintah langsung:
@@ -91,16 +92,10 @@ Pilih salah satu opsi di bawah ini atau gunakan perintah langsung:
 ℹ️ Bantuan & Info
 
 Atau langsung kirim foto bukti penimbangan! 📷
-        """
-        await update.message.reply_text(
-            menu_message.strip(),
-            parse_mode="Markdown",
-            reply_markup=reply_markup
-        )
+""".strip()
 
-    async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Handle /help command (called via menu button)."""
-        help_message = """
+# /help text
+_HELP_MESSAGE = """
 📱 Cara menggunakan Bot Tracking Pengiriman:
 
 *Perintah Tersedia:*
@@ -138,9 +133,507 @@ Atau langsung kirim foto bukti penimbangan! 📷
 ✅ Sertakan seluruh bukti dalam foto
 ✅ Hindari bayangan atau silau
 ✅ Pastikan teks dapat dibaca dengan jelas
+""".strip()
+
+# Help text for the "Bantuan" menu button
+_MENU_HELP_MESSAGE = """
+📱 Cara menggunakan Bot Tracking Pengiriman:
+
+*Perintah Tersedia:*
+• **/menu** - Tampilkan menu utama dengan tombol interaktif
+• **/total** - Pilih tanggal untuk melihat total berat bersih
+
+*Fitur Menu (gunakan tombol):*
+1. **📸 Upload Bukti Penimbangan**
+   - Langsung kirim foto atau klik tombol Upload di menu
+   - AI akan mengekstrak data secara otomatis
+   - Mode Normal: Periksa dan setujui data sebelum disimpan
+   - Mode Auto-Save: Otomatis simpan tanpa konfirmasi
+
+2. **📊 Cek Pengiriman**
+   - Lihat 5 pengiriman terbaru
+   - Termasuk nomor nota, material, berat, dan tanggal
+
+3. **📈 Total Berat Bersih**
+   - Pilih tanggal (hari ini, kemarin, atau custom)
+   - Lihat breakdown per material
+   - Total berat bersih keseluruhan
+
+4. **⚡ Auto-Save Mode**
+   - Toggle ON/OFF di menu utama
+   - ON: Otomatis simpan semua foto (upload batch cepat)
+   - OFF: Konfirmasi setiap upload (lebih aman)
+
+5. **✏️ Edit Data** (Mode Normal)
+   - Setelah upload, Anda bisa edit data
+   - Format: `field: nilai_baru`
+   - Field: no_nota, kendaraan, material, berat_isi, berat_kosong
+
+*Tips untuk hasil terbaik:*
+✅ Pastikan foto jelas dan terang
+✅ Sertakan seluruh bukti dalam foto
+✅ Hindari bayangan atau silau
+✅ Pastikan teks dapat dibaca dengan jelas
+""".strip()
+
+# Upload prompt (/upload and the "Upload Bukti" button)
+_UPLOAD_MESSAGE = """
+📸 Silakan kirim foto bukti penimbangan!
+
+Pastikan:
+✅ Seluruh bukti terlihat jelas
+✅ Foto terang dan fokus
+✅ Teks dapat dibaca
+
+Saya akan mengekstrak detailnya dan menyimpan data pengiriman secara otomatis.
+""".strip()
+
+# Result messages (HTML) - callers pass already-escaped values
+_SAVED_TEMPLATE = """
+✅ <b>Tersimpan!</b>
+
+• <b>No Nota:</b> {receipt_number}
+• <b>Material:</b> {material_name}
+• <b>Berat Bersih:</b> {net_weight} ton
+• <b>Kendaraan:</b> {vehicle_number}
+
+Data sudah masuk ke Google Sheets.
+""".strip()
+
+_BATCH_SAVED_TEMPLATE = """
+✅ <b>{count} Pengiriman Tersimpan!</b>
+
+{summary}
+
+<b>Total Berat Bersih:</b> {total_weight:.2f} ton
+
+Data sudah masuk ke Google Sheets.
+""".strip()
+
+# Appended to the batch summary when some album photos were skipped
+_BATCH_FAILED_TEMPLATE = (
+    "\n\n⚠️ <b>Foto ke-{photos} gagal diproses</b> dan tidak disimpan. "
+    "Silakan kirim ulang foto tersebut."
+)
+
+
+# Decimal numbers as float() reads them (e.g. "12.5", ".5", "5.", "1e3");
+# decimal commas and ranges like "12,5" or "3-4" don't match
+_FLOAT_RE = re.compile(r"[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?")
+
+
+def _parse_float(value, default: Optional[float] = 0.0) -> Optional[float]:
+    """Parse a sheet cell as a float, default for empty or non-numeric cells.
+
+    Matching first avoids raising (and catching) ValueError for every
+    blank or malformed cell.
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        value = value.strip()
+        if _FLOAT_RE.fullmatch(value):
+            return float(value)
+    return default
+
+
+async def _run_io(func, *args, **kwargs):
+    """Run a blocking call on the default executor.
+
+    Like asyncio.to_thread, minus the contextvars copy - the handler
+    doesn't use context variables.
+    """
+    return await asyncio.get_running_loop().run_in_executor(
+        None, partial(func, *args, **kwargs)
+    )
+
+
+def _b(value) -> str:
+    """Format a (possibly user/OCR supplied) value as escaped HTML bold."""
+    return f"<b>{escape(str(value))}</b>"
+
+
+# Static keyboards - markup objects are immutable, so one instance is
+# shared by every message
+_START_MARKUP = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("🚀 Mulai Sekarang", callback_data="menu_upload"),
+        InlineKeyboardButton("📋 Lihat Menu", callback_data="show_menu")
+    ]
+])
+_MENU_MARKUP = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("📸 Upload Bukti", callback_data="menu_upload"),
+        InlineKeyboardButton("📊 Cek Pengiriman", callback_data="menu_check")
+    ],
+    [
+        InlineKeyboardButton("📈 Total Hari Ini", callback_data="menu_total"),
+        InlineKeyboardButton("ℹ️ Bantuan", callback_data="menu_help")
+    ]
+])
+
+
+def _parse_custom_date(text: str) -> date:
+    """Parse a typed date in YYYY-MM-DD or DD-MM-YYYY format.
+
+    Zero-padded ISO dates take the fromisoformat fast path; everything else
+    goes through strptime, which also accepts unpadded input such as
+    2024-1-5 (fromisoformat's extra forms like 20241225 stay rejected).
+
+    Raises:
+        ValueError: If the text matches neither format
+    """
+    if len(text) == 10 and text[4] == "-" and text[7] == "-":
+        try:
+            return date.fromisoformat(text)
+        except ValueError:
+            pass
+    try:
+        return datetime.strptime(text, "%Y-%m-%d").date()
+    except ValueError:
+        return datetime.strptime(text, "%d-%m-%Y").date()
+
+
+@lru_cache(maxsize=3)
+def _build_total_keyboard(today_iso: str) -> InlineKeyboardMarkup:
+    """Build the /total date picker, reused for the rest of the day.
+
+    Args:
+        today_iso: Today's date in YYYY-MM-DD format (the cache key)
+
+    Returns:
+        Markup with today, yesterday, the day before and a custom option
+    """
+    today = date.fromisoformat(today_iso)
+    yesterday = today - timedelta(days=1)
+    day_before = today - timedelta(days=2)
+
+    return InlineKeyboardMarkup([
+        [
+            InlineKeyboardButton(
+                f"📅 Hari Ini ({today.strftime('%d/%m')})",
+                callback_data=f"total_date:{today_iso}"
+            )
+        ],
+        [
+            InlineKeyboardButton(
+                f"📅 Kemarin ({yesterday.strftime('%d/%m')})",
+                callback_data=f"total_date:{yesterday.isoformat()}"
+            )
+        ],
+        [
+            InlineKeyboardButton(
+                f"📅 {day_before.strftime('%d/%m/%Y')}",
+                callback_data=f"total_date:{day_before.isoformat()}"
+            )
+        ],
+        [
+            InlineKeyboardButton(
+                "📝 Pilih Tanggal Lain...",
+                callback_data="total_custom_date"
+            )
+        ]
+    ])
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """Process polled updates concurrently across chats, in order per chat.
+
+    Mirrors the webhook's per-chat queues: one slow receipt doesn't hold up
+    other chats, but a chat's own updates (e.g. a date typed after tapping
+    "Tanggal Lain") are never handled out of order.
+    """
+
+    def __init__(self, max_concurrent_updates: int):
+        # PTB takes its own semaphore before do_process_update, so updates
+        # queued behind their chat would hold slots and could starve other
+        # chats; it is left unbounded and max_concurrent_updates applies
+        # inside the chat lock instead
+        super().__init__(sys.maxsize)
+        self._slots = asyncio.Semaphore(max_concurrent_updates)
+        # chat_id -> [lock, number of updates holding or awaiting it]
+        self._chat_locks: dict[int, list] = {}
+
+    async def do_process_update(self, update, coroutine) -> None:
+        """Run the update's handlers once earlier updates of its chat finish."""
+        chat = update.effective_chat if isinstance(update, Update) else None
+        if chat is None:
+            async with self._slots:
+                await coroutine
+            return
+
+        entry = self._chat_locks.get(chat.id)
+        if entry is None:
+            entry = self._chat_locks[chat.id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0], self._slots:
+                await coroutine
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._chat_locks[chat.id]
+
+    async def initialize(self) -> None:
+        """Nothing to set up."""
+
+    async def shutdown(self) -> None:
+        """Nothing to tear down."""
+
+
+class TelegramHandler:
+    """Handler for Telegram bot interactions - Delivery Receipt Tracking."""
+
+    def __init__(self):
+        """Initialize Telegram handler."""
+        self.bot_token = settings.telegram_bot_token
+
+        # Google clients, built in worker threads by _build_clients() -
+        # started by initialize() and awaited via _ensure_clients()
+        self.gemini_client: Optional[GeminiClient] = None
+        self.sheets_client: Optional[SheetsClient] = None
+        self._clients_task: Optional[asyncio.Task] = None
+
+        # Short-lived caches for repeated reads (e.g. tapping "Hari Ini"
+        # again); writes from this bot invalidate them, edits made directly
+        # in the sheet show up once the TTL expires
+        self._latest_cache: TTLCache = TTLCache(maxsize=8, ttl=30)
+        self._date_cache: TTLCache = TTLCache(maxsize=64, ttl=60)
+        # Bumped on every invalidation; a read that started before a save
+        # landed must not repopulate the cache with pre-save rows
+        self._cache_generation = 0
+
+        # Image uploads get their own pool so a burst of photos can't hold
+        # up the small Sheets calls sharing the default executor
+        self._upload_executor = ThreadPoolExecutor(
+            max_workers=UPLOAD_MAX_WORKERS, thread_name_prefix="gcs-upload"
+        )
+
+        self._sheets_semaphore = asyncio.Semaphore(SHEETS_MAX_CONCURRENCY)
+
+        # Photo downloads buffered per media_group_id until the album is
+        # complete
+        self._media_groups: dict[str, list[asyncio.Task[bytes]]] = {}
+        # "Album diterima" acknowledgement per album, edited into the summary
+        self._media_group_acks: dict[str, asyncio.Task[Message]] = {}
+        # Pending flush timer per album, with the flush itself so shutdown
+        # can run it early
+        self._media_group_timers: dict[
+            str, tuple[asyncio.TimerHandle, Callable[[], None]]
+        ] = {}
+
+        # Deliveries waiting for the next batched append; the lock keeps
+        # flushes sequential so row numbers don't collide
+        self._pending_saves: list[tuple[DeliveryRecord, asyncio.Future]] = []
+        self._save_timer: Optional[asyncio.TimerHandle] = None
+        self._save_lock = asyncio.Lock()
+
+        # References to background tasks (processing, save flushes,
+        # albums) so they aren't garbage collected and can be awaited
+        # on shutdown
+        self._background_tasks: set[asyncio.Task] = set()
+
+        # Exact-match callback_data -> handler ("total_date:" is a prefix
+        # and is handled separately in handle_callback)
+        self._callback_handlers = {
+            "total_custom_date": self._prompt_custom_date,
+            "show_menu": self.show_menu_inline,
+            "menu_upload": self.menu_upload_action,
+            "menu_check": self.menu_check_action,
+            "menu_total": self.menu_total_action,
+            "menu_help": self.menu_help_action,
+        }
+
+        logger.info("Telegram handler initialized for delivery tracking")
+
+    async def initialize(self) -> None:
+        """Start building the Google clients in the background.
+
+        Returns without waiting, so startup and /start, /menu and /help
+        don't pay for credential or Vertex AI setup; the Gemini warm-up
+        still begins before the first photo arrives.
+        """
+        if self._clients_task is None:
+            self._clients_task = self._spawn(self._build_clients())
+
+    async def _build_clients(self) -> None:
+        """Build the Gemini and Sheets clients in worker threads."""
+        self.gemini_client, self.sheets_client = await asyncio.gather(
+            asyncio.to_thread(GeminiClient),
+            asyncio.to_thread(SheetsClient),
+        )
+
+    async def _ensure_clients(self) -> None:
+        """Wait for the Google clients, building them if not started yet.
+
+        A failed build is retried by the next caller.
+        """
+        await self.initialize()
+        task = self._clients_task
+        try:
+            await task
+        except Exception:
+            if self._clients_task is task:
+                self._clients_task = None
+            raise
+
+    async def _run_sheets(self, func, *args, **kwargs):
+        """Run a blocking Sheets call, limited to SHEETS_MAX_CONCURRENCY."""
+        async with self._sheets_semaphore:
+            return await _run_io(func, *args, **kwargs)
+
+    async def _get_latest_deliveries(self, limit: int = 5) -> list[dict]:
+        """Get the latest deliveries, served from cache when fresh.
+
+        Cache access stays on the event loop; only the Sheets read runs
+        in a worker thread.
         """
+        deliveries = self._latest_cache.get(limit)
+        if deliveries is None:
+            await self._ensure_clients()
+            generation = self._cache_generation
+            deliveries = await self._run_sheets(
+                self.sheets_client.get_latest_deliveries, limit=limit
+            )
+            # Don't cache empty results - they may come from an API error
+            if deliveries and generation == self._cache_generation:
+                self._latest_cache[limit] = deliveries
+        return deliveries
+
+    async def _get_deliveries_by_date(self, date_str: str) -> list[dict]:
+        """Get deliveries for a date, served from cache when fresh."""
+        deliveries = self._date_cache.get(date_str)
+        if deliveries is None:
+            await self._ensure_clients()
+            generation = self._cache_generation
+            deliveries = await self._run_sheets(
+                self.sheets_client.get_deliveries_by_date, date_str
+            )
+            if deliveries and generation == self._cache_generation:
+                self._date_cache[date_str] = deliveries
+        return deliveries
+
+    def _invalidate_delivery_cache(self, deliveries: list[DeliveryRecord]):
+        """Drop cached reads affected by newly saved deliveries."""
+        self._cache_generation += 1
+        self._latest_cache.clear()
+        for delivery in deliveries:
+            self._date_cache.pop(delivery.weighing_datetime.split()[0], None)
+
+    def _spawn(self, coro) -> asyncio.Task:
+        """Start a background task, kept referenced until it finishes."""
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return task
+
+    async def _save_deliveries(self, deliveries: list[DeliveryRecord]) -> bool:
+        """Queue deliveries for the next batched append and wait for them.
+
+        Every Sheets append of delivery rows goes through this queue, so
+        "No" numbering is always assigned under _save_lock.
+
+        Returns:
+            True if every delivery was saved
+        """
+        loop = asyncio.get_running_loop()
+        futures = [loop.create_future() for _ in deliveries]
+        self._pending_saves.extend(zip(deliveries, futures))
+
+        if len(self._pending_saves) >= SAVE_BATCH_SIZE:
+            self._flush_pending_saves()
+        elif self._save_timer is None:
+            self._save_timer = loop.call_later(
+                SAVE_BATCH_DELAY, self._flush_pending_saves
+            )
+        return all(await asyncio.gather(*futures))
+
+    async def _save_delivery(self, delivery: DeliveryRecord) -> bool:
+        """Queue one delivery for the next batched append and wait for it."""
+        return await self._save_deliveries([delivery])
+
+    def _flush_pending_saves(self):
+        """Start appending every queued delivery in one request."""
+        if self._save_timer is not None:
+            self._save_timer.cancel()
+            self._save_timer = None
+
+        batch, self._pending_saves = self._pending_saves, []
+        if batch:
+            self._spawn(self._append_batch(batch))
+
+    async def _append_batch(
+        self, batch: list[tuple[DeliveryRecord, asyncio.Future]]
+    ):
+        """Append a batch of queued deliveries and resolve their waiters.
+
+        batch_append_deliveries retries transient HttpErrors itself; a
+        batch only fails once those retries are exhausted.
+        """
+        deliveries = [delivery for delivery, _ in batch]
+        try:
+            await self._ensure_clients()
+            async with self._save_lock:
+                success = await self._run_sheets(
+                    self.sheets_client.batch_append_deliveries,
+                    deliveries
+                )
+        except Exception as e:
+            logger.error(f"Batched delivery save failed: {e}")
+            success = False
+
+        if success:
+            self._invalidate_delivery_cache(deliveries)
+        for _, future in batch:
+            if not future.done():
+                future.set_result(success)
+
+    @staticmethod
+    def _aggregate(
+        deliveries: list[dict]
+    ) -> tuple[float, dict[str, float], int]:
+        """Sum berat bersih overall and per material in one pass.
+
+        Args:
+            deliveries: Delivery dictionaries from the sheets client
+
+        Returns:
+            Tuple of (total weight, weight per material, delivery count);
+            rows with an unparseable weight are counted but not summed
+        """
+        total_berat = 0.0
+        material_totals: defaultdict[str, float] = defaultdict(float)
+
+        for delivery in deliveries:
+            berat = _parse_float(delivery.get("berat_bersih"), default=None)
+            if berat is None:
+                continue
+            material = delivery.get("nama_material", "Unknown")
+            total_berat += berat
+            material_totals[material] += berat
+
+        return total_berat, material_totals, len(deliveries)
+
+    async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /start command."""
+        # Add quick access menu buttons
+        await update.message.reply_text(
+            _START_MESSAGE,
+            reply_markup=_START_MARKUP
+        )
+
+    async def menu_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /menu command - show main menu with quick action buttons."""
         await update.message.reply_text(
-            help_message.strip(),
+            _MENU_MESSAGE,
+            parse_mode="Markdown",
+            reply_markup=_MENU_MARKUP
+        )
+
+    async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /help command (called via menu button)."""
+        await update.message.reply_text(
+            _HELP_MESSAGE,
             parse_mode="Markdown"
         )
 
@@ -150,39 +643,9 @@ Atau langsung kirim foto bukti penimbangan! 📷
         context: ContextTypes.DEFAULT_TYPE
     ):
         """Handle /total command - show interactive date picker."""
-        from datetime import datetime, timedelta
-
-        today = datetime.now()
-        yesterday = today - timedelta(days=1)
-        day_before = today - timedelta(days=2)
-
-        keyboard = [
-            [
-                InlineKeyboardButton(
-                    f"📅 Hari Ini ({today.strftime('%d/%m')})",
-                    callback_data=f"total_date:{today.strftime('%Y-%m-%d')}"
-                )
-            ],
-            [
-                InlineKeyboardButton(
-                    f"📅 Kemarin ({yesterday.strftime('%d/%m')})",
-                    callback_data=f"total_date:{yesterday.strftime('%Y-%m-%d')}"
-                )
-            ],
-            [
-                InlineKeyboardButton(
-                    f"📅 {day_before.strftime('%d/%m/%Y')}",
-                    callback_data=f"total_date:{day_before.strftime('%Y-%m-%d')}"
-                )
-            ],
-            [
-                InlineKeyboardButton(
-                    "📝 Pilih Tanggal Lain...",
-                    callback_data="total_custom_date"
-                )
-            ]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = _build_total_keyboard(
+            datetime.now().strftime("%Y-%m-%d")
+        )
 
         await update.message.reply_text(
             "📊 *Total Berat Bersih Pengiriman*\n\n"
@@ -198,74 +661,89 @@ Atau langsung kirim foto bukti penimbangan! 📷
         date_str: str
     ):
         """Show total berat bersih for a specific date."""
+        message_obj = (
+            update.callback_query.message if update.callback_query
+            else update.message
+        )
         try:
-            from datetime import datetime
+            date_obj = date.fromisoformat(date_str)
+        except ValueError as e:
+            logger.error(f"Error in show_total_for_date: {e}")
+            await message_obj.reply_text(
+                "❌ Maaf, terjadi kesalahan saat menghitung total."
+            )
+            return
 
-            date_obj = datetime.strptime(date_str, "%Y-%m-%d")
-            display_date = date_obj.strftime("%d %B %Y")
+        await self._send_total_for_date(
+            update, message_obj, date_str, date_obj.strftime("%d %B %Y")
+        )
 
-            if update.callback_query:
-                await update.callback_query.message.reply_text(
-                    f"📊 Menghitung total berat untuk {display_date}..."
-                )
-                message_obj = update.callback_query.message
-            else:
-                await update.message.reply_text(
-                    f"📊 Menghitung total berat untuk {display_date}..."
-                )
-                message_obj = update.message
+    async def _send_total_for_date(
+        self,
+        update: Update,
+        message_obj: Message,
+        date_str: str,
+        display_date: str
+    ):
+        """Reply to message_obj with the total berat bersih for a date.
 
-            deliveries = self.sheets_client.get_deliveries_by_date(date_str)
+        Shared by /total date selection and the "Total Hari Ini" button.
+
+        Args:
+            update: Incoming update (for logging the user)
+            message_obj: Message to reply to
+            date_str: Date in YYYY-MM-DD format
+            display_date: Human readable date for the reply
+        """
+        progress = None
+        try:
+            # Progress message is edited into the result (one send, not two)
+            progress = await message_obj.reply_text(
+                f"📊 Menghitung total berat untuk {display_date}..."
+            )
+
+            deliveries = await self._get_deliveries_by_date(date_str)
 
             if not deliveries:
-                await message_obj.reply_text(
+                await progress.edit_text(
                     f"📭 Tidak ada data pengiriman untuk {display_date}."
                 )
                 return
 
-            total_berat = 0.0
-            material_totals = {}
-
-            for delivery in deliveries:
-                berat_bersih = delivery.get("berat_bersih", "0")
-                material = delivery.get("nama_material", "Unknown")
-
-                try:
-                    berat = float(berat_bersih)
-                    total_berat += berat
-
-                    if material not in material_totals:
-                        material_totals[material] = 0.0
-                    material_totals[material] += berat
-                except (ValueError, TypeError):
-                    pass
-
-            message = f"📊 *Total Pengiriman - {display_date}*\n\n"
-            message += f"📦 *Jumlah Pengiriman:* {len(deliveries)}\n\n"
-
-            message += "*Breakdown per Material:*\n"
-            for material, berat in sorted(
-                material_totals.items(),
-                key=lambda x: x[1],
-                reverse=True
-            ):
-                message += f"• {material}: {berat:.2f} ton\n"
+            total_berat, material_totals, count = self._aggregate(deliveries)
 
-            message += f"\n{'='*30}\n"
-            message += f"*TOTAL BERAT BERSIH: {total_berat:.2f} ton*"
+            # HTML with escaped values - material names come from OCR and
+            # may contain Markdown characters such as _ or *
+            parts = [
+                f"📊 {_b(f'Total Pengiriman - {display_date}')}\n\n",
+                f"📦 <b>Jumlah Pengiriman:</b> {count}\n\n",
+                "<b>Breakdown per Material:</b>\n"
+            ]
+            parts.extend(
+                f"• {escape(material)}: {berat:.2f} ton\n"
+                for material, berat in sorted(
+                    material_totals.items(),
+                    key=lambda x: x[1],
+                    reverse=True
+                )
+            )
+            parts.append(f"\n{'='*30}\n")
+            parts.append(f"<b>TOTAL BERAT BERSIH: {total_berat:.2f} ton</b>")
+            message = "".join(parts)
 
-            await message_obj.reply_text(message, parse_mode="Markdown")
+            await progress.edit_text(message, parse_mode="HTML")
 
             logger.info(
                 f"Sent total summary for {date_str} to user {update.effective_user.id}"
             )
 
         except Exception as e:
-            logger.error(f"Error in show_total_for_date: {e}")
-            message_obj = update.callback_query.message if update.callback_query else update.message
-            await message_obj.reply_text(
-                "❌ Maaf, terjadi kesalahan saat menghitung total."
-            )
+            logger.error(f"Error sending total for {date_str}: {e}")
+            error_text = "❌ Maaf, terjadi kesalahan saat menghitung total."
+            if progress:
+                await progress.edit_text(error_text)
+            else:
+                await message_obj.reply_text(error_text)
 
     async def check_delivery_command(
         self,
@@ -273,59 +751,74 @@ Atau langsung kirim foto bukti penimbangan! 📷
         context: ContextTypes.DEFAULT_TYPE
     ):
         """Handle /cek_pengiriman command - show 5 latest deliveries."""
+        await self._send_latest_deliveries(update, update.message)
+
+    async def _send_latest_deliveries(
+        self,
+        update: Update,
+        message_obj: Message
+    ):
+        """Reply to message_obj with the 5 latest deliveries.
+
+        Shared by /cek_pengiriman and the "Cek Pengiriman" button.
+
+        Args:
+            update: Incoming update (for logging the user)
+            message_obj: Message to reply to
+        """
+        progress = None
         try:
-            await update.message.reply_text("📊 Mengambil data pengiriman terbaru...")
+            progress = await message_obj.reply_text(
+                "📊 Mengambil data pengiriman terbaru..."
+            )
 
             # Get latest deliveries from sheets
-            deliveries = self.sheets_client.get_latest_deliveries(limit=5)
+            deliveries = await self._get_latest_deliveries(limit=5)
 
             if not deliveries:
-                await update.message.reply_text(
+                await progress.edit_text(
                     "Belum ada data pengiriman! Kirim foto bukti penimbangan untuk memulai."
                 )
                 return
 
-            # Format deliveries for display
-            message = "🚚 *5 Pengiriman Terbaru:*\n\n"
+            # Format deliveries for display (HTML, values escaped)
+            parts = ["🚚 <b>5 Pengiriman Terbaru:</b>\n\n"]
 
             for i, delivery in enumerate(deliveries, 1):
-                no_nota = delivery.get("no_nota", "N/A")
-                tanggal = delivery.get("tanggal", "N/A")
-                waktu = delivery.get("waktu", "N/A")
-                material = delivery.get("nama_material", "Unknown")
-                berat_bersih = delivery.get("berat_bersih", "0")
-                kendaraan = delivery.get("no_kendaraan", "N/A")
-                status = delivery.get("status", "N/A")
-
-                message += f"{i}. *{material}*\n"
-                message += f"   📋 Nota: {no_nota}\n"
-                message += f"   ⚖️ Berat: {berat_bersih} ton\n"
-                message += f"   🚛 Kendaraan: {kendaraan}\n"
-                message += f"   📅 {tanggal} {waktu}\n"
-                message += f"   ✓ {status}\n\n"
+                parts.append(
+                    f"{i}. {_b(delivery.get('nama_material', 'Unknown'))}\n"
+                    f"   📋 Nota: {escape(delivery.get('no_nota', 'N/A'))}\n"
+                    f"   ⚖️ Berat: {escape(delivery.get('berat_bersih', '0'))} ton\n"
+                    f"   🚛 Kendaraan: {escape(delivery.get('no_kendaraan', 'N/A'))}\n"
+                    f"   📅 {escape(delivery.get('tanggal', 'N/A'))} "
+                    f"{escape(delivery.get('waktu', 'N/A'))}\n"
+                    f"   ✓ {escape(delivery.get('status', 'N/A'))}\n\n"
+                )
 
             # Add total weight
-            try:
-                total_weight = sum(
-                    float(d.get("berat_bersih", 0))
-                    for d in deliveries
-                    if d.get("berat_bersih")
-                )
-                message += f"─────────────\n"
-                message += f"*Total Berat:* {total_weight:.2f} ton"
-            except (ValueError, TypeError):
-                pass
+            total_weight = sum(
+                _parse_float(d.get("berat_bersih")) for d in deliveries
+            )
+            parts.append(
+                f"─────────────\n<b>Total Berat:</b> {total_weight:.2f} ton"
+            )
+
+            message = "".join(parts)
 
-            await update.message.reply_text(message, parse_mode="Markdown")
+            await progress.edit_text(message, parse_mode="HTML")
 
             logger.info(f"Sent latest deliveries to user {update.effective_user.id}")
 
         except Exception as e:
-            logger.error(f"Error in check_delivery_command: {e}")
-            await update.message.reply_text(
+            logger.error(f"Error sending latest deliveries: {e}")
+            error_text = (
                 "❌ Maaf, terjadi kesalahan saat mengambil data pengiriman. "
                 "Silakan coba lagi nanti."
             )
+            if progress:
+                await progress.edit_text(error_text)
+            else:
+                await message_obj.reply_text(error_text)
 
     async def upload_command(
         self,
@@ -333,17 +826,7 @@ Atau langsung kirim foto bukti penimbangan! 📷
         context: ContextTypes.DEFAULT_TYPE
     ):
         """Handle /upload command - prompt for receipt image."""
-        message = """
-📸 Silakan kirim foto bukti penimbangan!
-
-Pastikan:
-✅ Seluruh bukti terlihat jelas
-✅ Foto terang dan fokus
-✅ Teks dapat dibaca
-
-Saya akan mengekstrak detailnya dan menyimpan data pengiriman secara otomatis.
-        """
-        await update.message.reply_text(message.strip())
+        await update.message.reply_text(_UPLOAD_MESSAGE)
 
     async def handle_photo(
         self,
@@ -351,74 +834,212 @@ Saya akan mengekstrak detailnya dan menyimpan data pengiriman secara otomatis.
         context: ContextTypes.DEFAULT_TYPE
     ):
         """Handle delivery receipt photo uploads - single or media group."""
-        try:
-            # Acknowledge receipt immediately
-            await update.message.reply_text(
-                "📸 Foto diterima! Memproses..."
+        if update.message.media_group_id is not None:
+            await self._buffer_album_photo(update, context)
+            return
+
+        # Acknowledge receipt immediately (this message is later edited
+        # into the result) while the highest quality photo downloads
+        progress_message, image_bytes = await asyncio.gather(
+            update.message.reply_text("📸 Foto diterima! Memproses..."),
+            self._download_photo(context, update.message.photo[-1].file_id),
+            return_exceptions=True
+        )
+
+        error = next(
+            (
+                result for result in (progress_message, image_bytes)
+                if isinstance(result, BaseException)
+            ),
+            None
+        )
+        if error is not None:
+            logger.error(f"Error handling photo: {error}", exc_info=error)
+            error_text = (
+                "❌ Terjadi kesalahan saat menerima foto. "
+                "Silakan coba lagi."
             )
+            # Turn the acknowledgement into the error so it doesn't keep
+            # saying the photo is being processed
+            if isinstance(progress_message, Message):
+                await progress_message.edit_text(error_text)
+            else:
+                await update.message.reply_text(error_text)
+            return
+
+        logger.info(f"Processing image for user {update.effective_user.id}")
+
+        # Process single image in background
+        self._spawn(
+            self._process_single_image(
+                chat_id=update.effective_chat.id,
+                image_bytes=image_bytes,
+                context=context,
+                progress_message=progress_message
+            )
+        )
 
-            # Get the highest quality photo
-            photo = update.message.photo[-1]
-            photo_file = await context.bot.get_file(photo.file_id)
+    async def _buffer_album_photo(
+        self,
+        update: Update,
+        context: ContextTypes.DEFAULT_TYPE
+    ):
+        """Start downloading an album photo and (re)arm the album flush.
 
-            # Download image bytes
-            image_bytes = await photo_file.download_as_bytearray()
-            image_bytes = bytes(image_bytes)
+        The buffer and timer are updated without awaiting in between, so
+        photos handled concurrently can't slip past a flush.
+        """
+        message = update.message
+        media_group_id = message.media_group_id
 
-            # Save to temp file
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.jpg')
-            temp_file.write(image_bytes)
-            temp_file_path = temp_file.name
-            temp_file.close()
+        downloads = self._media_groups.setdefault(media_group_id, [])
+        first_photo = not downloads
+        downloads.append(
+            asyncio.create_task(
+                self._download_photo(context, message.photo[-1].file_id)
+            )
+        )
 
-            logger.info(
-                f"Processing image for user {update.effective_user.id}"
+        pending = self._media_group_timers.get(media_group_id)
+        if pending is not None:
+            pending[0].cancel()
+        flush = partial(
+            self._flush_album,
+            media_group_id, update.effective_chat.id, context
+        )
+        self._media_group_timers[media_group_id] = (
+            asyncio.get_running_loop().call_later(MEDIA_GROUP_DELAY, flush),
+            flush
+        )
+
+        if first_photo:
+            ack = asyncio.create_task(
+                message.reply_text("📸 Album diterima! Memproses...")
             )
+            self._media_group_acks[media_group_id] = ack
+            await ack
 
-            # Process single image in background
-            asyncio.create_task(
-                self._process_single_image(
-                    chat_id=update.effective_chat.id,
-                    temp_file_path=temp_file_path,
-                    context=context
-                )
+    def _flush_album(
+        self,
+        media_group_id: str,
+        chat_id: int,
+        context: ContextTypes.DEFAULT_TYPE
+    ):
+        """Start processing a complete album as one batch."""
+        self._media_group_timers.pop(media_group_id, None)
+        downloads = self._media_groups.pop(media_group_id, None)
+        ack = self._media_group_acks.pop(media_group_id, None)
+        if downloads:
+            self._spawn(
+                self._process_album(chat_id, downloads, context, ack)
             )
 
-        except Exception as e:
-            logger.error(f"Error handling photo: {e}", exc_info=True)
-            await update.message.reply_text(
+    async def _process_album(
+        self,
+        chat_id: int,
+        downloads: list[asyncio.Task],
+        context: ContextTypes.DEFAULT_TYPE,
+        ack: Optional[asyncio.Task] = None
+    ):
+        """Wait for an album's downloads, then process them as a batch."""
+        progress_message = None
+        if ack is not None:
+            try:
+                progress_message = await ack
+            except Exception as e:
+                logger.warning(f"Album acknowledgement failed: {e}")
+
+        images = []
+        photo_numbers = []
+        failed_photos = []
+        results = await asyncio.gather(*downloads, return_exceptions=True)
+        for number, result in enumerate(results, start=1):
+            if isinstance(result, Exception):
+                logger.error(f"Error downloading album photo: {result}")
+                failed_photos.append(number)
+            else:
+                images.append(result)
+                photo_numbers.append(number)
+
+        if not images:
+            await self._send_result(
+                context, chat_id, progress_message,
                 "❌ Terjadi kesalahan saat menerima foto. "
                 "Silakan coba lagi."
             )
+            return
+
+        await self._process_multiple_images(
+            chat_id, images, context,
+            progress_message=progress_message,
+            photo_numbers=photo_numbers,
+            failed_photos=failed_photos
+        )
+
+    @staticmethod
+    async def _download_photo(
+        context: ContextTypes.DEFAULT_TYPE, file_id: str
+    ) -> bytes:
+        """Download a Telegram photo into memory (no temp file)."""
+        photo_file = await context.bot.get_file(file_id)
+
+        # BytesIO.getvalue() hands back its buffer without the extra
+        # bytearray -> bytes copy
+        buffer = BytesIO()
+        await photo_file.download_to_memory(buffer)
+        return buffer.getvalue()
 
     async def _process_single_image(
         self,
         chat_id: int,
-        temp_file_path: str,
-        context: ContextTypes.DEFAULT_TYPE
+        image_bytes: bytes,
+        context: ContextTypes.DEFAULT_TYPE,
+        progress_message: Optional[Message] = None
     ):
-        """Process single image: upload to GCS, extract data, save to Sheets."""
+        """Process single image: upload to GCS, extract data, save to Sheets.
+
+        The result replaces progress_message when given, otherwise it is
+        sent as a new message.
+        """
         try:
             logger.info(f"Processing single image for chat {chat_id}")
+            await self._ensure_clients()
 
-            # Step 1: Upload to GCS first to get URI
-            import time
-            temp_receipt_id = f"temp_{int(time.time())}_{chat_id}"
-            temp_datetime = time.strftime("%Y-%m-%d %H:%M:%S")
-
-            receipt_url, gcs_uri = await asyncio.to_thread(
-                self.sheets_client.upload_image_to_storage,
-                image_path=temp_file_path,
-                receipt_number=temp_receipt_id,
-                weighing_datetime=temp_datetime
+            # Step 1: Preprocess once - the upload and Gemini both receive
+            # an upright JPEG within 800x800 and skip their own re-encode
+            image_bytes = await _run_io(
+                self.gemini_client.maybe_preprocess, image_bytes
             )
-            logger.info(f"Image uploaded to GCS: {gcs_uri}")
 
-            # Step 2: Extract receipt data using GCS URI
-            receipt_data, confidence, token_usage = await asyncio.to_thread(
-                self.gemini_client.extract_receipt_data,
-                gcs_uri=gcs_uri
+            # Step 2: Upload to GCS (for the receipt link) while Gemini
+            # reads the image inline - neither needs the other's result
+            temp_receipt_id = f"temp_{int(time.time())}_{chat_id}"
+            temp_datetime = datetime.now()
+            extract = self.gemini_client.extract_receipt_data_async
+
+            upload = asyncio.get_running_loop().run_in_executor(
+                self._upload_executor,
+                partial(
+                    self.sheets_client.upload_image_to_storage,
+                    image_bytes=image_bytes,
+                    receipt_number=temp_receipt_id,
+                    weighing_datetime=temp_datetime
+                )
             )
+            if len(image_bytes) <= INLINE_IMAGE_LIMIT:
+                (receipt_url, gcs_uri), extraction = await asyncio.gather(
+                    upload, extract(image_bytes=image_bytes)
+                )
+            else:
+                # Too large to send inline: Gemini reads the receipt blob
+                # rather than staging a second copy of the image in GCS
+                receipt_url, gcs_uri = await upload
+                extraction = await (
+                    extract(gcs_uri=gcs_uri) if gcs_uri
+                    else extract(image_bytes=image_bytes)
+                )
+            receipt_data, confidence, token_usage = extraction
+            logger.info(f"Image uploaded to GCS: {gcs_uri}")
 
             # Log token usage
             if token_usage:
@@ -429,12 +1050,11 @@ Saya akan mengekstrak detailnya dan menyimpan data pengiriman secara otomatis.
                 )
 
             if receipt_data is None:
-                await context.bot.send_message(
-                    chat_id=chat_id,
-                    text="❌ Tidak dapat mengekstrak data dari bukti. "
+                await self._send_result(
+                    context, chat_id, progress_message,
+                    "❌ Tidak dapat mengekstrak data dari bukti. "
                     "Pastikan foto jelas."
                 )
-                os.unlink(temp_file_path)
                 return
 
             # Log token usage to Sheets (non-blocking)
@@ -450,8 +1070,8 @@ Saya akan mengekstrak detailnya dan menyimpan data pengiriman secara otomatis.
                         ),
                         total_tokens=token_usage.get('total_token_count', 0)
                     )
-                    asyncio.create_task(
-                        asyncio.to_thread(
+                    self._spawn(
+                        self._run_sheets(
                             self.sheets_client.append_token_usage,
                             token_record
                         )
@@ -468,115 +1088,153 @@ Saya akan mengekstrak detailnya dan menyimpan data pengiriman secara otomatis.
             )
             logger.info(f"Material categorized as: {delivery.material_type}")
 
-            # Step 4: Save to Google Sheets
-            success = await asyncio.to_thread(
-                self.sheets_client.append_delivery,
-                delivery
-            )
-
-            # Clean up temp file
-            try:
-                os.unlink(temp_file_path)
-            except Exception:
-                pass
+            # Step 4: Save to Google Sheets (batched with concurrent saves)
+            success = await self._save_delivery(delivery)
 
             # Step 5: Notify user
             if success:
-                message = f"""
-✅ *Tersimpan!*
-
-• *No Nota:* {receipt_data.receipt_number}
-• *Material:* {receipt_data.material_name}
-• *Berat Bersih:* {receipt_data.net_weight} ton
-• *Kendaraan:* {receipt_data.vehicle_number}
-
-Data sudah masuk ke Google Sheets.
-                """
-                await context.bot.send_message(
-                    chat_id=chat_id,
-                    text=message.strip(),
-                    parse_mode="Markdown"
+                message = _SAVED_TEMPLATE.format(
+                    receipt_number=escape(receipt_data.receipt_number),
+                    material_name=escape(receipt_data.material_name),
+                    net_weight=receipt_data.net_weight,
+                    vehicle_number=escape(receipt_data.vehicle_number)
+                )
+                await self._send_result(
+                    context, chat_id, progress_message,
+                    message,
+                    parse_mode="HTML"
                 )
                 logger.info(
                     f"Saved delivery: {receipt_data.receipt_number}"
                 )
             else:
-                await context.bot.send_message(
-                    chat_id=chat_id,
-                    text="❌ Gagal menyimpan ke Google Sheets. "
+                await self._send_result(
+                    context, chat_id, progress_message,
+                    "❌ Gagal menyimpan ke Google Sheets. "
                     "Silakan coba lagi."
                 )
 
         except Exception as e:
             logger.error(f"Error processing single image: {e}", exc_info=True)
             try:
-                await context.bot.send_message(
-                    chat_id=chat_id,
-                    text="❌ Terjadi kesalahan saat memproses. "
+                await self._send_result(
+                    context, chat_id, progress_message,
+                    "❌ Terjadi kesalahan saat memproses. "
                     "Silakan coba lagi."
                 )
             except Exception:
                 pass
+
+    async def _send_result(
+        self,
+        context: ContextTypes.DEFAULT_TYPE,
+        chat_id: int,
+        progress_message: Optional[Message],
+        text: str,
+        parse_mode: Optional[str] = None
+    ):
+        """Edit the progress message into the result, or send a new one."""
+        if progress_message is not None:
             try:
-                os.unlink(temp_file_path)
-            except Exception:
-                pass
+                await progress_message.edit_text(text, parse_mode=parse_mode)
+                return
+            except TelegramError as e:
+                logger.warning(f"Could not edit progress message: {e}")
+
+        await context.bot.send_message(
+            chat_id=chat_id,
+            text=text,
+            parse_mode=parse_mode
+        )
 
     async def _process_multiple_images(
         self,
         chat_id: int,
-        temp_file_paths: list[str],
-        context: ContextTypes.DEFAULT_TYPE
+        images: list[bytes],
+        context: ContextTypes.DEFAULT_TYPE,
+        progress_message: Optional[Message] = None,
+        photo_numbers: Optional[list[int]] = None,
+        failed_photos: Optional[list[int]] = None
     ):
-        """Process multiple images: batch upload to GCS, extract, save."""
+        """Process multiple images: batch upload to GCS, extract, save.
+
+        Args:
+            chat_id: Chat to report the result to
+            images: Downloaded photo bytes
+            context: Telegram callback context
+            progress_message: Acknowledgement to edit into the summary
+            photo_numbers: Position of each image in the album (1-based),
+                defaults to the order of images
+            failed_photos: Album positions that already failed (e.g. to
+                download); listed in the summary with extraction failures
+        """
+        if photo_numbers is None:
+            photo_numbers = list(range(1, len(images) + 1))
+        failed_photos = list(failed_photos or ())
+        photo_count = len(images) + len(failed_photos)
+
         try:
-            import time
             logger.info(
-                f"Processing {len(temp_file_paths)} images for chat {chat_id}"
+                f"Processing {len(images)} images for chat {chat_id}"
             )
+            await self._ensure_clients()
 
             # Step 1: Prepare data for batch upload
-            temp_datetime = time.strftime("%Y-%m-%d %H:%M:%S")
+            temp_datetime = datetime.now()
             receipt_numbers = [
                 f"temp_{int(time.time())}_{chat_id}_{i}"
-                for i in range(len(temp_file_paths))
+                for i in range(len(images))
             ]
-            weighing_datetimes = [temp_datetime] * len(temp_file_paths)
+            weighing_datetimes = [temp_datetime] * len(images)
 
             # Step 2: Upload all images to GCS concurrently
-            upload_results = await asyncio.to_thread(
-                self.sheets_client.batch_upload_images_to_storage,
-                image_paths=temp_file_paths,
-                receipt_numbers=receipt_numbers,
-                weighing_datetimes=weighing_datetimes
+            upload_results = await asyncio.get_running_loop().run_in_executor(
+                self._upload_executor,
+                partial(
+                    self.sheets_client.batch_upload_images_to_storage,
+                    images=images,
+                    receipt_numbers=receipt_numbers,
+                    weighing_datetimes=weighing_datetimes
+                )
             )
             logger.info(f"Batch uploaded {len(upload_results)} images to GCS")
 
-            # Step 3: Process each image sequentially with Gemini
+            # Step 3: Extract all images concurrently with Gemini (bounded
+            # by the client's concurrency limit); images whose upload
+            # failed are sent inline instead of by GCS URI
+            extract = self.gemini_client.extract_receipt_data_async
+            image_count = len(images)
+            extractions = await asyncio.gather(
+                *(
+                    extract(gcs_uri=gcs_uri) if gcs_uri
+                    else extract(image_bytes=image)
+                    for image, (_, gcs_uri) in zip(images, upload_results)
+                ),
+                return_exceptions=True
+            )
+
             deliveries = []
+            token_records = []
             successful_count = 0
             total_weight = 0.0
 
-            for i, (temp_file_path, (receipt_url, gcs_uri)) in enumerate(
-                zip(temp_file_paths, upload_results)
+            for i, ((receipt_url, _), extraction) in enumerate(
+                zip(upload_results, extractions)
             ):
                 try:
-                    # Extract receipt data using GCS URI
-                    receipt_data, confidence, token_usage = (
-                        await asyncio.to_thread(
-                            self.gemini_client.extract_receipt_data,
-                            gcs_uri=gcs_uri
-                        )
-                    )
+                    if isinstance(extraction, Exception):
+                        raise extraction
+                    receipt_data, confidence, token_usage = extraction
 
                     if receipt_data is None:
                         logger.warning(f"Failed to extract data from image {i+1}")
+                        failed_photos.append(photo_numbers[i])
                         continue
 
-                    # Log token usage (non-blocking)
+                    # Collect token usage for one append after the loop
                     if token_usage:
                         try:
-                            token_record = TokenUsageRecord(
+                            token_records.append(TokenUsageRecord(
                                 receipt_number=receipt_data.receipt_number,
                                 operation="extraction",
                                 model="gemini-2.5-flash-lite",
@@ -589,13 +1247,7 @@ Data sudah masuk ke Google Sheets.
                                 total_tokens=token_usage.get(
                                     'total_token_count', 0
                                 )
-                            )
-                            asyncio.create_task(
-                                asyncio.to_thread(
-                                    self.sheets_client.append_token_usage,
-                                    token_record
-                                )
-                            )
+                            ))
                         except Exception as e:
                             logger.warning(f"Token usage logging failed: {e}")
 
@@ -611,60 +1263,56 @@ Data sudah masuk ke Google Sheets.
                     total_weight += receipt_data.net_weight
 
                     logger.info(
-                        f"Processed image {i+1}/{len(temp_file_paths)}: "
+                        f"Processed image {i+1}/{image_count}: "
                         f"{receipt_data.receipt_number}"
                     )
 
                 except Exception as e:
                     logger.error(f"Error processing image {i+1}: {e}")
+                    failed_photos.append(photo_numbers[i])
                     continue
 
-            # Step 4: Batch save all deliveries to Sheets
-            if deliveries:
-                success = await asyncio.to_thread(
-                    self.sheets_client.batch_append_deliveries,
-                    deliveries
+            # Log token usage for the whole batch (non-blocking)
+            if token_records:
+                self._spawn(
+                    self._run_sheets(
+                        self.sheets_client.batch_append_token_usage,
+                        token_records
+                    )
                 )
+
+            # Step 4: Save all deliveries to Sheets (via the batched queue)
+            if deliveries:
+                success = await self._save_deliveries(deliveries)
             else:
                 success = False
 
-            # Clean up temp files
-            for temp_file_path in temp_file_paths:
-                try:
-                    os.unlink(temp_file_path)
-                except Exception:
-                    pass
-
             # Step 5: Send summary message
             if success and deliveries:
-                summary_lines = []
-                for delivery in deliveries:
-                    summary_lines.append(
-                        f"• {delivery.receipt_number}: "
+                message = _BATCH_SAVED_TEMPLATE.format(
+                    count=successful_count,
+                    summary="\n".join(
+                        f"• {escape(delivery.receipt_number)}: "
                         f"{delivery.net_weight}t"
+                        for delivery in deliveries
+                    ),
+                    total_weight=total_weight
+                )
+                if failed_photos:
+                    message += _BATCH_FAILED_TEMPLATE.format(
+                        photos=", ".join(map(str, sorted(failed_photos)))
                     )
-
-                message = f"""
-✅ *{successful_count} Pengiriman Tersimpan!*
-
-{chr(10).join(summary_lines)}
-
-*Total Berat Bersih:* {total_weight:.2f} ton
-
-Data sudah masuk ke Google Sheets.
-                """
-                await context.bot.send_message(
-                    chat_id=chat_id,
-                    text=message.strip(),
-                    parse_mode="Markdown"
+                await self._send_result(
+                    context, chat_id, progress_message, message,
+                    parse_mode="HTML"
                 )
                 logger.info(
                     f"Saved {successful_count} deliveries from batch"
                 )
             else:
-                await context.bot.send_message(
-                    chat_id=chat_id,
-                    text=f"❌ Gagal memproses {len(temp_file_paths)} foto. "
+                await self._send_result(
+                    context, chat_id, progress_message,
+                    f"❌ Gagal memproses {photo_count} foto. "
                     "Silakan coba lagi."
                 )
 
@@ -673,19 +1321,13 @@ Data sudah masuk ke Google Sheets.
                 f"Error processing multiple images: {e}", exc_info=True
             )
             try:
-                await context.bot.send_message(
-                    chat_id=chat_id,
-                    text="❌ Terjadi kesalahan saat memproses foto. "
+                await self._send_result(
+                    context, chat_id, progress_message,
+                    "❌ Terjadi kesalahan saat memproses foto. "
                     "Silakan coba lagi."
                 )
             except Exception:
                 pass
-            # Clean up temp files
-            for temp_file_path in temp_file_paths:
-                try:
-                    os.unlink(temp_file_path)
-                except Exception:
-                    pass
 
     async def handle_callback(
         self,
@@ -700,25 +1342,26 @@ Data sudah masuk ke Google Sheets.
         if query.data.startswith("total_date:"):
             date_str = query.data.split(":")[1]
             await self.show_total_for_date(update, context, date_str)
-        elif query.data == "total_custom_date":
-            await query.message.reply_text(
-                "📝 *Masukkan tanggal yang ingin dilihat:*\n\n"
-                "Format: `YYYY-MM-DD` atau `DD-MM-YYYY`\n"
-                "Contoh: `2024-12-25` atau `25-12-2024`",
-                parse_mode="Markdown"
-            )
-            context.user_data["awaiting_custom_date"] = True
-        # Menu button callbacks
-        elif query.data == "show_menu":
-            await self.show_menu_inline(update, context)
-        elif query.data == "menu_upload":
-            await self.menu_upload_action(update, context)
-        elif query.data == "menu_check":
-            await self.menu_check_action(update, context)
-        elif query.data == "menu_total":
-            await self.menu_total_action(update, context)
-        elif query.data == "menu_help":
-            await self.menu_help_action(update, context)
+            return
+
+        # Menu button and custom date callbacks
+        handler = self._callback_handlers.get(query.data)
+        if handler:
+            await handler(update, context)
+
+    async def _prompt_custom_date(
+        self,
+        update: Update,
+        context: ContextTypes.DEFAULT_TYPE
+    ):
+        """Ask for a custom date for the total (handled as text)."""
+        await update.callback_query.message.reply_text(
+            "📝 *Masukkan tanggal yang ingin dilihat:*\n\n"
+            "Format: `YYYY-MM-DD` atau `DD-MM-YYYY`\n"
+            "Contoh: `2024-12-25` atau `25-12-2024`",
+            parse_mode="Markdown"
+        )
+        context.user_data["awaiting_custom_date"] = True
 
     async def show_menu_inline(
         self,
@@ -726,34 +1369,10 @@ Data sudah masuk ke Google Sheets.
         context: ContextTypes.DEFAULT_TYPE
     ):
         """Show menu via inline callback."""
-        keyboard = [
-            [
-                InlineKeyboardButton("📸 Upload Bukti", callback_data="menu_upload"),
-                InlineKeyboardButton("📊 Cek Pengiriman", callback_data="menu_check")
-            ],
-            [
-                InlineKeyboardButton("📈 Total Hari Ini", callback_data="menu_total"),
-                InlineKeyboardButton("ℹ️ Bantuan", callback_data="menu_help")
-            ]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-
-        menu_message = """
-🏠 *Menu Utama - Bot Tracking Pengiriman*
-
-Pilih salah satu opsi di bawah ini atau gunakan perintah langsung:
-
-📸 Upload Bukti Penimbangan
-📊 Lihat 5 Pengiriman Terbaru
-📈 Total Berat Bersih Hari Ini
-ℹ️ Bantuan & Info
-
-Atau langsung kirim foto bukti penimbangan! 📷
-        """
         await update.callback_query.message.reply_text(
-            menu_message.strip(),
+            _MENU_MESSAGE,
             parse_mode="Markdown",
-            reply_markup=reply_markup
+            reply_markup=_MENU_MARKUP
         )
 
     async def menu_upload_action(
@@ -762,17 +1381,7 @@ Atau langsung kirim foto bukti penimbangan! 📷
         context: ContextTypes.DEFAULT_TYPE
     ):
         """Handle upload action from menu button."""
-        message = """
-📸 Silakan kirim foto bukti penimbangan!
-
-Pastikan:
-✅ Seluruh bukti terlihat jelas
-✅ Foto terang dan fokus
-✅ Teks dapat dibaca
-
-Saya akan mengekstrak detailnya dan menyimpan data pengiriman secara otomatis.
-        """
-        await update.callback_query.message.reply_text(message.strip())
+        await update.callback_query.message.reply_text(_UPLOAD_MESSAGE)
 
     async def menu_check_action(
         self,
@@ -780,58 +1389,9 @@ Saya akan mengekstrak detailnya dan menyimpan data pengiriman secara otomatis.
         context: ContextTypes.DEFAULT_TYPE
     ):
         """Handle check deliveries action from menu button."""
-        try:
-            await update.callback_query.message.reply_text(
-                "📊 Mengambil data pengiriman terbaru..."
-            )
-
-            deliveries = self.sheets_client.get_latest_deliveries(limit=5)
-
-            if not deliveries:
-                await update.callback_query.message.reply_text(
-                    "Belum ada data pengiriman! Kirim foto bukti penimbangan untuk memulai."
-                )
-                return
-
-            message = "🚚 *5 Pengiriman Terbaru:*\n\n"
-
-            for i, delivery in enumerate(deliveries, 1):
-                no_nota = delivery.get("no_nota", "N/A")
-                tanggal = delivery.get("tanggal", "N/A")
-                waktu = delivery.get("waktu", "N/A")
-                material = delivery.get("nama_material", "Unknown")
-                berat_bersih = delivery.get("berat_bersih", "0")
-                kendaraan = delivery.get("no_kendaraan", "N/A")
-                status = delivery.get("status", "N/A")
-
-                message += f"{i}. *{material}*\n"
-                message += f"   📋 Nota: {no_nota}\n"
-                message += f"   ⚖️ Berat: {berat_bersih} ton\n"
-                message += f"   🚛 Kendaraan: {kendaraan}\n"
-                message += f"   📅 {tanggal} {waktu}\n"
-                message += f"   ✓ {status}\n\n"
-
-            try:
-                total_weight = sum(
-                    float(d.get("berat_bersih", 0))
-                    for d in deliveries
-                    if d.get("berat_bersih")
-                )
-                message += f"─────────────\n"
-                message += f"*Total Berat:* {total_weight:.2f} ton"
-            except (ValueError, TypeError):
-                pass
-
-            await update.callback_query.message.reply_text(
-                message,
-                parse_mode="Markdown"
-            )
-
-        except Exception as e:
-            logger.error(f"Error in menu_check_action: {e}")
-            await update.callback_query.message.reply_text(
-                "❌ Maaf, terjadi kesalahan saat mengambil data pengiriman."
-            )
+        await self._send_latest_deliveries(
+            update, update.callback_query.message
+        )
 
     async def menu_total_action(
         self,
@@ -839,66 +1399,13 @@ Saya akan mengekstrak detailnya dan menyimpan data pengiriman secara otomatis.
         context: ContextTypes.DEFAULT_TYPE
     ):
         """Handle total today action from menu button."""
-        try:
-            from datetime import datetime
-
-            date_obj = datetime.now()
-            date_str = date_obj.strftime("%Y-%m-%d")
-            display_date = "Hari Ini (" + date_obj.strftime("%d %B %Y") + ")"
-
-            await update.callback_query.message.reply_text(
-                f"📊 Menghitung total berat untuk {display_date}..."
-            )
-
-            deliveries = self.sheets_client.get_deliveries_by_date(date_str)
-
-            if not deliveries:
-                await update.callback_query.message.reply_text(
-                    f"📭 Tidak ada data pengiriman untuk {display_date}."
-                )
-                return
-
-            total_berat = 0.0
-            material_totals = {}
-
-            for delivery in deliveries:
-                berat_bersih = delivery.get("berat_bersih", "0")
-                material = delivery.get("nama_material", "Unknown")
-
-                try:
-                    berat = float(berat_bersih)
-                    total_berat += berat
-
-                    if material not in material_totals:
-                        material_totals[material] = 0.0
-                    material_totals[material] += berat
-                except (ValueError, TypeError):
-                    pass
-
-            message = f"📊 *Total Pengiriman - {display_date}*\n\n"
-            message += f"📦 *Jumlah Pengiriman:* {len(deliveries)}\n\n"
-
-            message += "*Breakdown per Material:*\n"
-            for material, berat in sorted(
-                material_totals.items(),
-                key=lambda x: x[1],
-                reverse=True
-            ):
-                message += f"• {material}: {berat:.2f} ton\n"
-
-            message += f"\n{'='*30}\n"
-            message += f"*TOTAL BERAT BERSIH: {total_berat:.2f} ton*"
-
-            await update.callback_query.message.reply_text(
-                message,
-                parse_mode="Markdown"
-            )
-
-        except Exception as e:
-            logger.error(f"Error in menu_total_action: {e}")
-            await update.callback_query.message.reply_text(
-                "❌ Maaf, terjadi kesalahan saat menghitung total."
-            )
+        date_obj = datetime.now()
+        await self._send_total_for_date(
+            update,
+            update.callback_query.message,
+            date_obj.strftime("%Y-%m-%d"),
+            "Hari Ini (" + date_obj.strftime("%d %B %Y") + ")"
+        )
 
     async def menu_help_action(
         self,
@@ -906,47 +1413,8 @@ Saya akan mengekstrak detailnya dan menyimpan data pengiriman secara otomatis.
         context: ContextTypes.DEFAULT_TYPE
     ):
         """Handle help action from menu button."""
-        help_message = """
-📱 Cara menggunakan Bot Tracking Pengiriman:
-
-*Perintah Tersedia:*
-• **/menu** - Tampilkan menu utama dengan tombol interaktif
-• **/total** - Pilih tanggal untuk melihat total berat bersih
-
-*Fitur Menu (gunakan tombol):*
-1. **📸 Upload Bukti Penimbangan**
-   - Langsung kirim foto atau klik tombol Upload di menu
-   - AI akan mengekstrak data secara otomatis
-   - Mode Normal: Periksa dan setujui data sebelum disimpan
-   - Mode Auto-Save: Otomatis simpan tanpa konfirmasi
-
-2. **📊 Cek Pengiriman**
-   - Lihat 5 pengiriman terbaru
-   - Termasuk nomor nota, material, berat, dan tanggal
-
-3. **📈 Total Berat Bersih**
-   - Pilih tanggal (hari ini, kemarin, atau custom)
-   - Lihat breakdown per material
-   - Total berat bersih keseluruhan
-
-4. **⚡ Auto-Save Mode**
-   - Toggle ON/OFF di menu utama
-   - ON: Otomatis simpan semua foto (upload batch cepat)
-   - OFF: Konfirmasi setiap upload (lebih aman)
-
-5. **✏️ Edit Data** (Mode Normal)
-   - Setelah upload, Anda bisa edit data
-   - Format: `field: nilai_baru`
-   - Field: no_nota, kendaraan, material, berat_isi, berat_kosong
-
-*Tips untuk hasil terbaik:*
-✅ Pastikan foto jelas dan terang
-✅ Sertakan seluruh bukti dalam foto
-✅ Hindari bayangan atau silau
-✅ Pastikan teks dapat dibaca dengan jelas
-        """
         await update.callback_query.message.reply_text(
-            help_message.strip(),
+            _MENU_HELP_MESSAGE,
             parse_mode="Markdown"
         )
 
@@ -962,15 +1430,10 @@ Saya akan mengekstrak detailnya dan menyimpan data pengiriman secara otomatis.
         if context.user_data.get("awaiting_custom_date"):
             context.user_data.pop("awaiting_custom_date", None)
 
-            from datetime import datetime
             try:
-                # Try parsing different formats
-                try:
-                    date_obj = datetime.strptime(text, "%Y-%m-%d")
-                except ValueError:
-                    date_obj = datetime.strptime(text, "%d-%m-%Y")
+                date_obj = _parse_custom_date(text)
 
-                date_str = date_obj.strftime("%Y-%m-%d")
+                date_str = date_obj.isoformat()
                 await self.show_total_for_date(update, context, date_str)
                 return
             except ValueError:
@@ -988,6 +1451,23 @@ Saya akan mengekstrak detailnya dan menyimpan data pengiriman secara otomatis.
             "Ketik /menu atau /start untuk melihat opsi yang tersedia."
         )
 
+    async def shutdown(self):
+        """Finish buffered work before the process exits.
+
+        Pending albums and queued saves are flushed now instead of waiting
+        for their timers, then every background task is awaited (including
+        ones those tasks start, e.g. an album's save flush).
+        """
+        for timer, flush in list(self._media_group_timers.values()):
+            timer.cancel()
+            flush()
+        self._flush_pending_saves()
+
+        while self._background_tasks:
+            await asyncio.gather(
+                *list(self._background_tasks), return_exceptions=True
+            )
+
     def setup_handlers(self, application: Application):
         """Set up all command and message handlers."""
         # Command handlers - only /start, /menu, and /total allowed
@@ -1019,21 +1499,42 @@ Saya akan mengekstrak detailnya dan menyimpan data pengiriman secara otomatis.
         Returns:
             Application: Configured Telegram application with all handlers registered.
         """
-        from telegram.request import HTTPXRequest
-
-        # Create custom request with longer timeouts for Cloud Run
+        # Create custom request with longer timeouts for Cloud Run.
+        # HTTP/2 multiplexes concurrent bot API calls over one kept-alive
+        # TLS connection to api.telegram.org.
         request = HTTPXRequest(
-            connection_pool_size=8,
+            connection_pool_size=32,
             connect_timeout=30.0,  # 30 seconds for connection
             read_timeout=120.0,    # 2 minutes for read (handles slow networks)
             write_timeout=30.0,    # 30 seconds for write
-            pool_timeout=10.0      # 10 seconds for getting connection from pool
+            pool_timeout=10.0,     # 10 seconds for getting connection from pool
+            http_version="2"
+        )
+
+        # Separate client for getUpdates so long polling never holds a
+        # connection needed by outgoing replies
+        get_updates_request = HTTPXRequest(
+            connection_pool_size=1,
+            connect_timeout=30.0,
+            read_timeout=120.0,
+            write_timeout=30.0,
+            pool_timeout=10.0,
+            http_version="2"
         )
 
         application = (
             Application.builder()
             .token(self.bot_token)
             .request(request)
+            .get_updates_request(get_updates_request)
+            # Polled updates are handled concurrently across chats but in
+            # order within a chat (the webhook path schedules updates
+            # itself and is unaffected)
+            .concurrent_updates(
+                ChatOrderedUpdateProcessor(settings.max_inflight_updates)
+            )
+            .post_init(lambda _application: self.initialize())
+            .post_stop(lambda _application: self.shutdown())
             .build()
         )
         self.setup_handlers(application)
@@ -1045,4 +1546,6 @@ Saya akan mengekstrak detailnya dan menyimpan data pengiriman secara otomatis.
         application = self.create_application()
 
         logger.info("Starting bot in polling mode...")
-        application.run_polling(allowed_updates=Update.ALL_TYPES)
+        application.run_polling(
+            allowed_updates=ALLOWED_UPDATES, timeout=POLL_TIMEOUT
+        )
@@ -1,5 +1,15 @@
 """Data models for delivery tracking."""
 
-from .delivery import DeliveryRecord, DeliveryReceiptData, MATERIAL_TYPES
+from .delivery import (
+    DeliveryRecord,
+    DeliveryReceiptData,
+    MATERIAL_TYPES,
+    MATERIAL_TYPES_SET,
+)
 
-__all__ = ["DeliveryRecord", "DeliveryReceiptData", "MATERIAL_TYPES"]
+__all__ = [
+    "DeliveryRecord",
+    "DeliveryReceiptData",
+    "MATERIAL_TYPES",
+    "MATERIAL_TYPES_SET",
+]
@@ -41,6 +41,12 @@ class DeliveryReceiptData(BaseModel):
             raise ValueError("Net weight must be greater than 0")
         return v
 
+    @field_validator("material_type")
+    @classmethod
+    def validate_material_type(cls, v: str) -> str:
+        """Fall back to "Lainnya" for categories outside MATERIAL_TYPES."""
+        return v if v in MATERIAL_TYPES_SET else "Lainnya"
+
 
 class DeliveryRecord(BaseModel):
     """Complete delivery record for Google Sheets."""
@@ -166,3 +172,6 @@ MATERIAL_TYPES = [
     "Abu Batu",
     "Lainnya"
 ]
+
+# Set view of MATERIAL_TYPES for O(1) membership checks
+MATERIAL_TYPES_SET = frozenset(MATERIAL_TYPES)
@@ -1,7 +1,6 @@
 """Google Cloud Storage client for uploading receipt images."""
 
-import os
-from datetime import datetime
+from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Optional
 from google.cloud import storage
@@ -54,10 +53,6 @@ class GCSClient:
             FileNotFoundError: If image file doesn't exist
             Exception: If upload fails
         """
-        # Validate file exists
-        if not os.path.exists(image_path):
-            raise FileNotFoundError(f"Image file not found: {image_path}")
-
         # Get file extension
         file_ext = Path(image_path).suffix or ".jpg"
 
@@ -79,6 +74,8 @@ class GCSClient:
 
         try:
             # Upload to GCS
+            # A missing file raises FileNotFoundError from the open itself,
+            # no separate stat needed
             blob = self.bucket.blob(blob_name)
             blob.upload_from_filename(image_path)
 
@@ -175,8 +172,6 @@ class GCSClient:
         Returns:
             Signed URL string
         """
-        from datetime import timedelta
-
         blob = self.bucket.blob(blob_name)
         url = blob.generate_signed_url(
             version="v4",
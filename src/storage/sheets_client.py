@@ -3,19 +3,20 @@
 import os
 import socket
 import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
 from typing import List, Dict, Any
-from io import BytesIO
 import google.auth
 from google.oauth2 import service_account
 from google.cloud import storage
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-from PIL import Image
 from loguru import logger
 from tenacity import retry, stop_after_attempt, wait_exponential
 
 from ..models.delivery import DeliveryRecord, TokenUsageRecord
 from ..config import settings
+from ..utils.image import preprocess_image
 
 # Set default socket timeout to prevent hanging
 socket.setdefaulttimeout(60)
@@ -30,6 +31,14 @@ class SheetsClient:
     ]
     SHEET_NAME = "Pengiriman"  # "Deliveries" in Indonesian
     TOKEN_USAGE_SHEET_NAME = "Token Usage"
+    # Delivery sheet columns A:O as dictionary keys (in Indonesian)
+    HEADERS = (
+        "no", "tanggal", "no_nota", "waktu",
+        "no_timbangan", "no_kendaraan", "nama_material",
+        "jenis_material", "berat_isi", "berat_kosong",
+        "berat_bersih", "status", "catatan", "url_bukti",
+        "ditambahkan"
+    )
 
     def __init__(self):
         """Initialize the Sheets and Storage clients."""
@@ -216,19 +225,20 @@ class SheetsClient:
         try:
             service = self._get_sheets_service()
             # First, get the total row count efficiently
+            # (rowCount only - rowMetadata would return one entry per row)
             sheet_metadata = service.spreadsheets().get(
                 spreadsheetId=self.spreadsheet_id,
                 ranges=[f"{self.SHEET_NAME}!A:A"],
-                fields="sheets.data.rowMetadata"
+                fields="sheets.properties.gridProperties.rowCount"
             ).execute()
 
             sheets = sheet_metadata.get("sheets", [])
             if not sheets:
                 return []
 
-            row_data = sheets[0].get("data", [{}])[0]
-            row_metadata = row_data.get("rowMetadata", [])
-            total_rows = len(row_metadata)
+            total_rows = sheets[0].get("properties", {}).get(
+                "gridProperties", {}
+            ).get("rowCount", 0)
 
             if total_rows <= 1:  # Only header or empty
                 return []
@@ -248,24 +258,10 @@ class SheetsClient:
             if not values:
                 return []
 
-            # Reverse to get latest first
-            latest_values = list(reversed(values))[:limit]
-
-            # Convert to dictionaries (in Indonesian)
-            headers = [
-                "no", "tanggal", "no_nota", "waktu",
-                "no_timbangan", "no_kendaraan", "nama_material",
-                "jenis_material", "berat_isi", "berat_kosong",
-                "berat_bersih", "status", "catatan", "url_bukti",
-                "ditambahkan"
-            ]
+            # Latest first - one reversed slice of at most `limit` rows
+            latest_values = values[:-limit - 1:-1]
 
-            deliveries = []
-            for row in latest_values:
-                # Pad row with empty strings if needed
-                row = row + [""] * (len(headers) - len(row))
-                delivery_dict = dict(zip(headers, row))
-                deliveries.append(delivery_dict)
+            deliveries = self._rows_to_dicts(latest_values)
 
             logger.info(f"Retrieved {len(deliveries)} latest deliveries")
             return deliveries
@@ -274,6 +270,15 @@ class SheetsClient:
             logger.error(f"Failed to get latest deliveries: {e}")
             return []
 
+    def _rows_to_dicts(self, rows: List[List[str]]) -> List[Dict[str, Any]]:
+        """Convert sheet rows to dictionaries keyed by HEADERS."""
+        width = len(self.HEADERS)
+        # Pad rows with empty strings if needed
+        return [
+            dict(zip(self.HEADERS, row + [""] * (width - len(row))))
+            for row in rows
+        ]
+
     @retry(
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=2, max=10)
@@ -281,6 +286,9 @@ class SheetsClient:
     def get_deliveries_by_date(self, date_str: str) -> List[Dict[str, Any]]:
         """Get all delivery records for a specific date.
 
+        Reads only the date column to find matching rows, then fetches
+        just those rows in a single batchGet.
+
         Args:
             date_str: Date in YYYY-MM-DD format
 
@@ -289,36 +297,49 @@ class SheetsClient:
         """
         try:
             service = self._get_sheets_service()
-            # Get all data
+            # Get the date column only (tanggal is column B)
             result = service.spreadsheets().values().get(
                 spreadsheetId=self.spreadsheet_id,
-                range=f"{self.SHEET_NAME}!A2:O"  # Skip header
+                range=f"{self.SHEET_NAME}!B2:B"  # Skip header
             ).execute()
 
-            values = result.get("values", [])
-
-            if not values:
+            dates = result.get("values", [])
+
+            # Sheet row numbers of matching dates, merged into runs of
+            # consecutive rows (deliveries are appended chronologically,
+            # so a day is usually one run)
+            ranges = []
+            run_start = run_end = None
+            for row_no, cell in enumerate(dates, start=2):
+                if not cell or cell[0] != date_str:
+                    continue
+                if run_end is not None and row_no == run_end + 1:
+                    run_end = row_no
+                    continue
+                if run_start is not None:
+                    ranges.append(
+                        f"{self.SHEET_NAME}!A{run_start}:O{run_end}"
+                    )
+                run_start = run_end = row_no
+            if run_start is not None:
+                ranges.append(f"{self.SHEET_NAME}!A{run_start}:O{run_end}")
+
+            if not ranges:
+                logger.info(f"Retrieved 0 deliveries for {date_str}")
                 return []
 
-            # Headers for conversion
-            headers = [
-                "no", "tanggal", "no_nota", "waktu",
-                "no_timbangan", "no_kendaraan", "nama_material",
-                "jenis_material", "berat_isi", "berat_kosong",
-                "berat_bersih", "status", "catatan", "url_bukti",
-                "ditambahkan"
-            ]
-
-            # Filter by date
-            deliveries = []
-            for row in values:
-                # Pad row with empty strings if needed
-                row = row + [""] * (len(headers) - len(row))
-                delivery_dict = dict(zip(headers, row))
+            result = service.spreadsheets().values().batchGet(
+                spreadsheetId=self.spreadsheet_id,
+                ranges=ranges,
+                majorDimension="ROWS"
+            ).execute()
 
-                # Check if date matches (tanggal is index 1)
-                if delivery_dict.get("tanggal") == date_str:
-                    deliveries.append(delivery_dict)
+            rows = [
+                row
+                for value_range in result.get("valueRanges", [])
+                for row in value_range.get("values", [])
+            ]
+            deliveries = self._rows_to_dicts(rows)
 
             logger.info(f"Retrieved {len(deliveries)} deliveries for {date_str}")
             return deliveries
@@ -327,6 +348,10 @@ class SheetsClient:
             logger.error(f"Failed to get deliveries by date: {e}")
             return []
 
+    @retry(
+        stop=stop_after_attempt(2),
+        wait=wait_exponential(multiplier=1, min=1, max=5)
+    )
     def batch_append_deliveries(
         self, deliveries: List[DeliveryRecord]
     ) -> bool:
@@ -355,44 +380,42 @@ class SheetsClient:
 
         except HttpError as e:
             logger.error(f"Failed to batch append deliveries: {e}")
-            return False
+            raise
 
     def batch_upload_images_to_storage(
         self,
-        image_paths: List[str],
+        images: List[bytes],
         receipt_numbers: List[str],
-        weighing_datetimes: List[str]
+        weighing_datetimes: List[datetime]
     ) -> List[tuple[str, str]]:
         """Upload multiple images to GCS concurrently.
 
         Args:
-            image_paths: List of paths to image files
+            images: List of raw image bytes
             receipt_numbers: List of receipt numbers for filenames
-            weighing_datetimes: List of weighing datetimes in format
-                YYYY-MM-DD HH:MM:SS
+            weighing_datetimes: List of weighing datetimes (date part
+                used in the filename)
 
         Returns:
             List of (public_url, gcs_uri) tuples in same order as inputs.
             Returns ("", "") for failed uploads.
         """
-        from concurrent.futures import ThreadPoolExecutor, as_completed
-
-        if not image_paths:
+        if not images:
             return []
 
-        if len(image_paths) != len(receipt_numbers) != len(weighing_datetimes):
+        if len(images) != len(receipt_numbers) != len(weighing_datetimes):
             logger.error("Batch upload: mismatched list lengths")
-            return [("", "")] * len(image_paths)
+            return [("", "")] * len(images)
 
-        results = [("", "")] * len(image_paths)
+        results = [("", "")] * len(images)
 
         def upload_single(
-            index: int, img_path: str, receipt_num: str, weighing_dt: str
+            index: int, image: bytes, receipt_num: str, weighing_dt: datetime
         ):
             """Upload single image and return index with result."""
             try:
                 public_url, gcs_uri = self.upload_image_to_storage(
-                    img_path, receipt_num, weighing_dt
+                    image, receipt_num, weighing_dt
                 )
                 return index, (public_url, gcs_uri)
             except Exception as e:
@@ -400,14 +423,14 @@ class SheetsClient:
                 return index, ("", "")
 
         # Upload concurrently using ThreadPoolExecutor
-        max_workers = min(len(image_paths), 5)
+        max_workers = min(len(images), 5)
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
             futures = {
                 executor.submit(
-                    upload_single, i, img_path, receipt_num, weighing_dt
+                    upload_single, i, image, receipt_num, weighing_dt
                 ): i
-                for i, (img_path, receipt_num, weighing_dt) in enumerate(
-                    zip(image_paths, receipt_numbers, weighing_datetimes)
+                for i, (image, receipt_num, weighing_dt) in enumerate(
+                    zip(images, receipt_numbers, weighing_datetimes)
                 )
             }
 
@@ -415,48 +438,31 @@ class SheetsClient:
                 index, result = future.result()
                 results[index] = result
 
-        logger.info(f"Batch uploaded {len(image_paths)} images to GCS")
+        logger.info(f"Batch uploaded {len(images)} images to GCS")
         return results
 
-    def _preprocess_image(self, image_path: str) -> bytes:
+    def _preprocess_image(self, image_bytes: bytes) -> bytes:
         """Preprocess image before upload to reduce size and token usage.
 
         Uses fast BILINEAR resampling instead of slow LANCZOS.
         Target: 800x800 max, JPEG quality 80.
+        Upright JPEGs already within 800x800 are returned unchanged.
         """
         try:
-            img = Image.open(image_path)
-
-            # Auto-rotate based on EXIF (fast operation)
-            from PIL import ImageOps
-            img = ImageOps.exif_transpose(img)
-
-            # Convert to RGB if needed
-            if img.mode != "RGB":
-                img = img.convert("RGB")
-
-            # Fast resize using BILINEAR (much faster than LANCZOS)
-            max_size = (800, 800)
-            if img.size[0] > max_size[0] or img.size[1] > max_size[1]:
-                img.thumbnail(max_size, Image.Resampling.BILINEAR)
-                logger.info(f"Resized to {img.size}")
-
-            # Convert to JPEG bytes (quality 80, no optimize for speed)
-            img_byte_arr = BytesIO()
-            img.save(img_byte_arr, format="JPEG", quality=80)
-            return img_byte_arr.getvalue()
-
+            return preprocess_image(image_bytes, (800, 800), quality=80)
         except Exception as e:
             logger.warning(f"Preprocessing failed: {e}")
-            with open(image_path, 'rb') as f:
-                return f.read()
+            return image_bytes
 
     @retry(
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=1, max=4)
     )
     def upload_image_to_storage(
-        self, image_path: str, receipt_number: str, weighing_datetime: str
+        self,
+        image_bytes: bytes,
+        receipt_number: str,
+        weighing_datetime: datetime
     ) -> tuple[str, str]:
         """Upload receipt image to Google Cloud Storage.
 
@@ -465,9 +471,10 @@ class SheetsClient:
         Filename format: YYYY-MM-DD_RECEIPT-NUMBER.jpg
 
         Args:
-            image_path: Path to the image file
+            image_bytes: Raw image bytes (e.g. as downloaded from Telegram)
             receipt_number: Receipt number for filename
-            weighing_datetime: Weighing datetime in YYYY-MM-DD HH:MM:SS
+            weighing_datetime: Weighing datetime (date part used in the
+                filename)
 
         Returns:
             Tuple of (public_url, gcs_uri) where:
@@ -481,8 +488,7 @@ class SheetsClient:
                 logger.warning("GCS_BUCKET_NAME not set - skipping image upload")
                 return "", ""
 
-            # Extract date from weighing_datetime (YYYY-MM-DD)
-            date_str = weighing_datetime.split()[0]
+            date_str = weighing_datetime.strftime("%Y-%m-%d")
 
             # Create filename: YYYY-MM-DD_RECEIPT-NUMBER.jpg
             safe_receipt = "".join(
@@ -491,23 +497,24 @@ class SheetsClient:
             filename = f"{date_str}_{safe_receipt}.jpg"
 
             # Preprocess image (resize to reduce token usage)
-            preprocessed_bytes = self._preprocess_image(image_path)
+            preprocessed_bytes = self._preprocess_image(image_bytes)
 
             # Reuse storage client (per-thread)
             storage_client = self._get_storage_client()
             bucket = storage_client.bucket(bucket_name)
 
-            # Upload preprocessed image from bytes
+            # Upload preprocessed image from bytes, publicly readable.
+            # Setting the ACL in the upload request saves the separate
+            # make_public() call; images this size go up as one multipart
+            # request, so chunk size doesn't come into play
             blob = bucket.blob(filename)
             blob.upload_from_string(
                 preprocessed_bytes,
                 content_type='image/jpeg',
-                timeout=60
+                timeout=60,
+                predefined_acl='publicRead'
             )
 
-            # Make publicly accessible
-            blob.make_public()
-
             # Get both public URL and GCS URI
             public_url = blob.public_url
             gcs_uri = f"gs://{bucket_name}/{filename}"
@@ -595,3 +602,40 @@ class SheetsClient:
             # Log but don't raise - token usage logging is non-critical
             logger.warning(f"Failed to append token usage (non-critical): {e}")
             return False
+
+    def batch_append_token_usage(
+        self, token_usages: List[TokenUsageRecord]
+    ) -> bool:
+        """Append several token usage records in one request.
+
+        Non-critical operation - fails gracefully without affecting main flow.
+        """
+        if not token_usages:
+            return True
+
+        try:
+            service = self._get_sheets_service()
+            next_no = self._get_next_token_usage_no()
+
+            rows = []
+            for i, token_usage in enumerate(token_usages):
+                row = token_usage.to_sheets_row()
+                row[0] = str(next_no + i)  # Sequential numbering
+                rows.append(row)
+
+            service.spreadsheets().values().append(
+                spreadsheetId=self.spreadsheet_id,
+                range=f"{self.TOKEN_USAGE_SHEET_NAME}!A:H",
+                valueInputOption="USER_ENTERED",
+                insertDataOption="INSERT_ROWS",
+                body={"values": rows}
+            ).execute()
+
+            logger.info(f"Batch appended {len(rows)} token usage records")
+            return True
+
+        except Exception as e:
+            logger.warning(
+                f"Failed to batch append token usage (non-critical): {e}"
+            )
+            return False
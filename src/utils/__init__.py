@@ -1 +1,15 @@
 """Utility functions."""
+
+from .image import (
+    EXIF_ORIENTATION_TAG,
+    JpegHeader,
+    preprocess_image,
+    read_jpeg_header,
+)
+
+__all__ = [
+    "EXIF_ORIENTATION_TAG",
+    "JpegHeader",
+    "preprocess_image",
+    "read_jpeg_header",
+]
@@ -0,0 +1,170 @@
+"""Image helpers for receipt photos.
+
+Header parsing avoids decoding pixel data; preprocessing only decodes
+images that actually need resizing, rotating or re-encoding.
+"""
+
+import struct
+from io import BytesIO
+from typing import NamedTuple, Optional
+
+from PIL import Image, ImageOps
+from loguru import logger
+
+# EXIF orientation tag (0x0112) - 1 means the image is already upright
+EXIF_ORIENTATION_TAG = 0x0112
+
+# Start-of-frame markers that carry the image dimensions
+# (excludes DHT 0xC4, JPG 0xC8 and DAC 0xCC which share the range)
+_SOF_MARKERS = frozenset(
+    (0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7,
+     0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF)
+)
+
+
+class JpegHeader(NamedTuple):
+    """Dimensions and orientation read from a JPEG header."""
+
+    width: int
+    height: int
+    orientation: int
+
+
+def _read_exif_orientation(exif: bytes) -> int:
+    """Read the orientation tag from a raw EXIF (TIFF) block.
+
+    Args:
+        exif: APP1 payload after the "Exif\\0\\0" prefix
+
+    Returns:
+        EXIF orientation value, 1 if absent or unreadable
+    """
+    if exif[:2] == b"II":
+        endian = "<"
+    elif exif[:2] == b"MM":
+        endian = ">"
+    else:
+        return 1
+
+    (ifd_offset,) = struct.unpack_from(f"{endian}I", exif, 4)
+    (entries,) = struct.unpack_from(f"{endian}H", exif, ifd_offset)
+    for i in range(entries):
+        entry = ifd_offset + 2 + i * 12
+        tag, _type, _count, value = struct.unpack_from(
+            f"{endian}HHIH", exif, entry
+        )
+        if tag == EXIF_ORIENTATION_TAG:
+            return value
+    return 1
+
+
+def read_jpeg_header(data: bytes) -> Optional[JpegHeader]:
+    """Read JPEG dimensions and EXIF orientation by walking segment headers.
+
+    Only marker/length headers are parsed, so the cost does not depend on
+    the image resolution.
+
+    Args:
+        data: Raw image bytes
+
+    Returns:
+        JpegHeader, or None if the data is not a parseable JPEG
+    """
+    if data[:2] != b"\xff\xd8":
+        return None
+
+    orientation = 1
+    pos = 2
+    size = len(data)
+    try:
+        while pos + 4 <= size:
+            if data[pos] != 0xFF:
+                return None
+            marker = data[pos + 1]
+            # Fill bytes before a marker
+            if marker == 0xFF:
+                pos += 1
+                continue
+            # Standalone markers carry no length field
+            if marker == 0x01 or 0xD0 <= marker <= 0xD7:
+                pos += 2
+                continue
+            # Reached scan data or end of image without a frame header
+            if marker in (0xD9, 0xDA):
+                return None
+
+            (length,) = struct.unpack_from(">H", data, pos + 2)
+            segment = pos + 4
+
+            if marker == 0xE1 and data[segment:segment + 6] == b"Exif\x00\x00":
+                orientation = _read_exif_orientation(
+                    data[segment + 6:pos + 2 + length]
+                )
+            elif marker in _SOF_MARKERS:
+                height, width = struct.unpack_from(">HH", data, segment + 1)
+                return JpegHeader(width, height, orientation)
+
+            pos += 2 + length
+    except struct.error:
+        return None
+
+    return None
+
+
+def preprocess_image(
+    image_bytes: bytes,
+    max_size: tuple[int, int],
+    quality: int,
+    resample: Image.Resampling = Image.Resampling.BILINEAR,
+) -> bytes:
+    """Auto-rotate, downscale and re-encode an image as JPEG.
+
+    Upright JPEGs already within max_size are returned unchanged without
+    decoding.
+
+    Args:
+        image_bytes: Raw image bytes
+        max_size: Maximum (width, height) of the result
+        quality: JPEG quality for the re-encoded image
+        resample: Resampling filter used when downscaling
+
+    Returns:
+        image_bytes, or a freshly encoded JPEG
+
+    Raises:
+        Exception: If Pillow cannot decode or encode the image
+    """
+    header = read_jpeg_header(image_bytes)
+    if (header and header.orientation == 1 and
+            header.width <= max_size[0] and
+            header.height <= max_size[1]):
+        return image_bytes
+
+    img = Image.open(BytesIO(image_bytes))
+
+    # Let libjpeg downscale during decode (no-op for other formats)
+    img.draft("RGB", max_size)
+
+    # Auto-rotate based on EXIF orientation (skip if already upright)
+    try:
+        orientation = (
+            header.orientation if header
+            else img.getexif().get(EXIF_ORIENTATION_TAG, 1)
+        )
+        if orientation != 1:
+            img = ImageOps.exif_transpose(img)
+    except Exception:
+        pass
+
+    # Convert to RGB if needed
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+
+    if img.size[0] > max_size[0] or img.size[1] > max_size[1]:
+        img.thumbnail(max_size, resample)
+        logger.info(f"Resized image to {img.size}")
+
+    # Skip the extra optimize=True Huffman pass for speed
+    img_byte_arr = BytesIO()
+    img.save(img_byte_arr, format="JPEG", quality=quality)
+    return img_byte_arr.getvalue()
@@ -1,6 +1,8 @@
 """Full end-to-end test of delivery receipt processing pipeline."""
 
+import asyncio
 import sys
+from datetime import datetime
 from pathlib import Path
 
 # Add src to path
@@ -38,7 +40,9 @@ def test_full_pipeline():
 
     # Extract data with Gemini
     logger.info("\n[3/5] Extracting data with Gemini Vision API...")
-    receipt_data, confidence, token_usage = gemini_client.extract_receipt_data(image_bytes)
+    receipt_data, confidence, token_usage = asyncio.run(
+        gemini_client.extract_receipt_data_async(image_bytes)
+    )
 
     if not receipt_data:
         logger.error("✗ Failed to extract receipt data")
@@ -81,9 +85,11 @@ def test_full_pipeline():
     logger.info("\n[4/5] Uploading receipt image to Google Cloud Storage...")
     try:
         receipt_url, gcs_uri = sheets_client.upload_image_to_storage(
-            image_path=str(sample_path),
+            image_bytes=sample_path.read_bytes(),
             receipt_number=receipt_data.receipt_number,
-            weighing_datetime=receipt_data.weighing_datetime
+            weighing_datetime=datetime.fromisoformat(
+                receipt_data.weighing_datetime
+            )
         )
 
         if receipt_url:
@@ -35,12 +35,12 @@ def test_storage_upload():
     # Test upload
     logger.info("\nUploading to Google Cloud Storage...")
     receipt_number = "TEST" + datetime.now().strftime("%H%M%S")
-    weighing_datetime = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    date_str = weighing_datetime.split()[0]
+    weighing_datetime = datetime.now()
+    date_str = weighing_datetime.strftime("%Y-%m-%d")
 
     try:
         public_url, gcs_uri = client.upload_image_to_storage(
-            image_path=str(sample_path),
+            image_bytes=sample_path.read_bytes(),
             receipt_number=receipt_number,
             weighing_datetime=weighing_datetime
         )
@@ -1,5 +1,6 @@
 """Test script for Gemini Vision API with delivery receipts."""
 
+import asyncio
 import sys
 from pathlib import Path
 
@@ -30,7 +31,9 @@ def test_gemini_extraction():
         image_bytes = f.read()
 
     # Extract receipt data
-    receipt_data, confidence, token_usage = client.extract_receipt_data(image_bytes)
+    receipt_data, confidence, token_usage = asyncio.run(
+        client.extract_receipt_data_async(image_bytes)
+    )
 
     if receipt_data:
         logger.success("✓ Successfully extracted delivery receipt data!")
@@ -0,0 +1,70 @@
+"""Unit tests for JPEG header parsing and image preprocessing."""
+
+import sys
+from io import BytesIO
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.utils.image import (
+    EXIF_ORIENTATION_TAG,
+    JpegHeader,
+    preprocess_image,
+    read_jpeg_header,
+)
+
+
+def _encode(size=(40, 20), fmt="JPEG", orientation=None, **save_kwargs):
+    """Encode a solid test image, optionally tagged with an orientation."""
+    img = Image.new("RGB", size, "white")
+    if orientation is not None:
+        exif = Image.Exif()
+        exif[EXIF_ORIENTATION_TAG] = orientation
+        save_kwargs["exif"] = exif.tobytes()
+    buf = BytesIO()
+    img.save(buf, format=fmt, **save_kwargs)
+    return buf.getvalue()
+
+
+def test_read_jpeg_header_without_exif():
+    """Plain JPEGs report their size and an upright orientation."""
+    assert read_jpeg_header(_encode()) == JpegHeader(40, 20, 1)
+
+
+@pytest.mark.parametrize("orientation", [1, 3, 6, 8])
+def test_read_jpeg_header_orientation(orientation):
+    """The EXIF orientation is read without decoding the image."""
+    header = read_jpeg_header(_encode(orientation=orientation))
+    assert header == JpegHeader(40, 20, orientation)
+
+
+def test_read_jpeg_header_progressive():
+    """Progressive JPEGs (SOF2) are parsed like baseline ones."""
+    data = _encode(size=(64, 48), progressive=True, orientation=6)
+    assert read_jpeg_header(data) == JpegHeader(64, 48, 6)
+
+
+@pytest.mark.parametrize(
+    "data",
+    [b"", b"\xff\xd8", b"not an image", _encode(fmt="PNG")],
+)
+def test_read_jpeg_header_non_jpeg(data):
+    """Anything that isn't a parseable JPEG gives None."""
+    assert read_jpeg_header(data) is None
+
+
+def test_preprocess_image_keeps_small_upright_jpeg():
+    """Upright JPEGs within the limit are returned as-is."""
+    data = _encode()
+    assert preprocess_image(data, (800, 800), quality=80) is data
+
+
+def test_preprocess_image_rotates_and_resizes():
+    """Rotated or oversized images are re-encoded upright within the limit."""
+    data = _encode(size=(400, 200), orientation=6)
+    result = preprocess_image(data, (100, 100), quality=80)
+    assert read_jpeg_header(result) == JpegHeader(50, 100, 1)
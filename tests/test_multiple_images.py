@@ -4,6 +4,7 @@
 import asyncio
 import os
 import sys
+from datetime import datetime
 from pathlib import Path
 
 from loguru import logger
@@ -50,7 +51,7 @@ async def main():
         # Step 1: Batch upload to GCS
         logger.info(f"\n[1/4] Batch uploading {len(existing_images)} images to GCS...")
         import time
-        temp_datetime = time.strftime("%Y-%m-%d %H:%M:%S")
+        temp_datetime = datetime.now()
         receipt_numbers = [
             f"test_batch_{int(time.time())}_{i}"
             for i in range(len(existing_images))
@@ -59,7 +60,7 @@ async def main():
 
         upload_results = await asyncio.to_thread(
             sheets_client.batch_upload_images_to_storage,
-            image_paths=existing_images,
+            images=[Path(img).read_bytes() for img in existing_images],
             receipt_numbers=receipt_numbers,
             weighing_datetimes=weighing_datetimes
         )
@@ -83,9 +84,10 @@ async def main():
             logger.info(f"\n   Processing image {i}/{len(upload_results)}...")
 
             # Extract data
-            receipt_data, confidence, token_usage = await asyncio.to_thread(
-                gemini_client.extract_receipt_data,
-                gcs_uri=gcs_uri
+            receipt_data, confidence, token_usage = (
+                await gemini_client.extract_receipt_data_async(
+                    gcs_uri=gcs_uri
+                )
             )
 
             if receipt_data is None:
@@ -0,0 +1,62 @@
+"""Unit tests for parsing sheet weight cells."""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.messaging.telegram_handler import TelegramHandler, _parse_float
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        (12, 12.0),
+        (12.5, 12.5),
+        ("12.5", 12.5),
+        ("  7 ", 7.0),
+        ("-3.25", -3.25),
+        (".5", 0.5),
+        ("5.", 5.0),
+        ("1e3", 1000.0),
+    ],
+)
+def test_parse_float_accepts_what_float_accepts(value, expected):
+    """Values float() understands parse unchanged."""
+    assert _parse_float(value) == expected
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        None, "", "   ", "-", ".", "N/A", [], {},
+        # Not plain decimals - rejected rather than misread
+        "12,5", "1.234,5", "3-4", "12.5 ton", "nan", "inf",
+    ],
+)
+def test_parse_float_defaults_to_zero(value):
+    """Empty and non-numeric cells count as 0.0."""
+    assert _parse_float(value) == 0.0
+
+
+def test_parse_float_custom_default():
+    """Callers can tell unparseable cells apart from a real 0."""
+    assert _parse_float("12,5", default=None) is None
+    assert _parse_float("0", default=None) == 0.0
+
+
+def test_aggregate_skips_unparseable_rows():
+    """Rows with an unparseable weight are counted but not summed."""
+    deliveries = [
+        {"nama_material": "Pasir", "berat_bersih": "10.5"},
+        {"nama_material": "Pasir", "berat_bersih": "2"},
+        {"nama_material": "Batu", "berat_bersih": "12,5"},
+        {"nama_material": "Split", "berat_bersih": ""},
+    ]
+    total, per_material, count = TelegramHandler._aggregate(deliveries)
+    assert total == 12.5
+    assert dict(per_material) == {"Pasir": 12.5}
+    assert count == 4
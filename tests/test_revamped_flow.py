@@ -11,6 +11,7 @@ This script tests:
 import asyncio
 import os
 import sys
+from datetime import datetime
 from pathlib import Path
 
 from loguru import logger
@@ -50,11 +51,11 @@ async def test_single_image_flow():
         logger.info("Step 1: Uploading image to GCS...")
         import time
         temp_receipt_id = f"test_{int(time.time())}"
-        temp_datetime = time.strftime("%Y-%m-%d %H:%M:%S")
+        temp_datetime = datetime.now()
 
         receipt_url, gcs_uri = await asyncio.to_thread(
             sheets_client.upload_image_to_storage,
-            image_path=test_image_path,
+            image_bytes=Path(test_image_path).read_bytes(),
             receipt_number=temp_receipt_id,
             weighing_datetime=temp_datetime
         )
@@ -63,9 +64,10 @@ async def test_single_image_flow():
 
         # Step 2: Extract data using GCS URI
         logger.info("Step 2: Extracting receipt data using GCS URI...")
-        receipt_data, confidence, token_usage = await asyncio.to_thread(
-            gemini_client.extract_receipt_data,
-            gcs_uri=gcs_uri
+        receipt_data, confidence, token_usage = (
+            await gemini_client.extract_receipt_data_async(
+                gcs_uri=gcs_uri
+            )
         )
 
         if receipt_data is None:
@@ -148,7 +150,7 @@ async def test_batch_upload():
 
         # Prepare batch data
         import time
-        temp_datetime = time.strftime("%Y-%m-%d %H:%M:%S")
+        temp_datetime = datetime.now()
         receipt_numbers = [
             f"test_batch_{int(time.time())}_{i}"
             for i in range(len(existing_images))
@@ -159,7 +161,7 @@ async def test_batch_upload():
         logger.info("Uploading batch to GCS...")
         upload_results = await asyncio.to_thread(
             sheets_client.batch_upload_images_to_storage,
-            image_paths=existing_images,
+            images=[Path(img).read_bytes() for img in existing_images],
             receipt_numbers=receipt_numbers,
             weighing_datetimes=weighing_datetimes
         )
@@ -222,7 +224,7 @@ async def test_multiple_images_flow():
         # Step 1: Batch upload
         logger.info("Step 1: Batch uploading to GCS...")
         import time
-        temp_datetime = time.strftime("%Y-%m-%d %H:%M:%S")
+        temp_datetime = datetime.now()
         receipt_numbers = [
             f"test_multi_{int(time.time())}_{i}"
             for i in range(len(existing_images))
@@ -231,7 +233,7 @@ async def test_multiple_images_flow():
 
         upload_results = await asyncio.to_thread(
             sheets_client.batch_upload_images_to_storage,
-            image_paths=existing_images,
+            images=[Path(img).read_bytes() for img in existing_images],
             receipt_numbers=receipt_numbers,
             weighing_datetimes=weighing_datetimes
         )
@@ -250,9 +252,10 @@ async def test_multiple_images_flow():
             logger.info(f"   Processing image {i+1}...")
 
             # Extract data
-            receipt_data, confidence, token_usage = await asyncio.to_thread(
-                gemini_client.extract_receipt_data,
-                gcs_uri=gcs_uri
+            receipt_data, confidence, token_usage = (
+                await gemini_client.extract_receipt_data_async(
+                    gcs_uri=gcs_uri
+                )
             )
 
             if receipt_data is None:
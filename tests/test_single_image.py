@@ -4,6 +4,7 @@
 import asyncio
 import os
 import sys
+from datetime import datetime
 from pathlib import Path
 
 from loguru import logger
@@ -40,11 +41,11 @@ async def main():
         logger.info("\n[1/5] Uploading image to GCS...")
         import time
         temp_receipt_id = f"test_{int(time.time())}"
-        temp_datetime = time.strftime("%Y-%m-%d %H:%M:%S")
+        temp_datetime = datetime.now()
 
         receipt_url, gcs_uri = await asyncio.to_thread(
             sheets_client.upload_image_to_storage,
-            image_path=test_image,
+            image_bytes=Path(test_image).read_bytes(),
             receipt_number=temp_receipt_id,
             weighing_datetime=temp_datetime
         )
@@ -53,9 +54,10 @@ async def main():
 
         # Step 2: Extract data using GCS URI
         logger.info("\n[2/5] Extracting receipt data using GCS URI...")
-        receipt_data, confidence, token_usage = await asyncio.to_thread(
-            gemini_client.extract_receipt_data,
-            gcs_uri=gcs_uri
+        receipt_data, confidence, token_usage = (
+            await gemini_client.extract_receipt_data_async(
+                gcs_uri=gcs_uri
+            )
         )
 
         if receipt_data is None: